@@ -1,10 +1,22 @@
 import pygame
 import sys
-import random
 import os
-import numpy as np
-
-pygame.init()
+import time
+from collections import deque
+
+import anytime
+import bitboard
+import cache
+import reachability
+import replay
+import search
+from pieces import get_orientations, next_rotation, piece_id
+from tetris_engine import TetrisGame
+
+# Ressources partagées entre les jeux (resources.py, à la racine du dépôt)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import resources
+import telemetry
 
 GAME_WIDTH = 300
 GAME_HEIGHT = 600
@@ -19,56 +31,87 @@ WHITE = (255, 255, 255)
 GRAY = (100, 100, 100)
 BLACK = (0, 0, 0)
 
-SHAPE_COLORS = {
-    "line": (0, 255, 255),    # Cyan
-    "square": (255, 0, 0),    # Red
-    "t": (0, 255, 0),         # Green
-    "l": (0, 0, 255),         # Blue
-    "l_inv": (255, 255, 0),   # Yellow
-    "s": (255, 165, 0),       # Orange
-    "z": (128, 0, 128)        # Purple
-}
+# Nombre de processus entre lesquels répartir la recherche de l'IA (0 : recherche dans le processus du jeu)
+AI_WORKERS = 0
 
-SHAPES = {
-    "line": [[1, 1, 1, 1]],
-    "square": [[1, 1], [1, 1]],
-    "t": [[0, 1, 0], [1, 1, 1]],
-    "l": [[1, 0, 0], [1, 1, 1]],
-    "l_inv": [[0, 0, 1], [1, 1, 1]],
-    "s": [[0, 1, 1], [1, 1, 0]],
-    "z": [[1, 1, 0], [0, 1, 1]]
-}
+# Recherche en faisceau (voir search.beam_placement) : AI_DEPTH pièces anticipées en ne développant
+# que AI_BEAM_WIDTH grilles par coup. AI_BEAM_WIDTH = 0 garde la recherche complète à 2 pièces.
+# Mesuré sans affichage (tetris_engine.py, 12 parties de 400 pièces), en pièces/s et lignes/partie :
+#   recherche complète à 2 pièces   190 p/s, 142 lignes
+#   profondeur 3, faisceau 2 / 4 / 6   358 / 205 / 146 p/s, 128 / 121 / 138 lignes
+#   profondeur 4, faisceau 2 / 4 / 8   129 / 67 / 35 p/s, 144 / 149 / 142 lignes
+# Le faisceau de 4 sur 3 pièces coûte autant que la recherche à 2 pièces mais fait moins de lignes :
+# seuls les faisceaux de 2 et 4 sur 4 pièces, 1,5 à 3 fois plus lents, font un peu mieux.
+AI_DEPTH = 3
+AI_BEAM_WIDTH = 0
 
+# Coups glissés sous les surplombs (voir reachability.py), sauf en recherche en faisceau.
+# La pièce suit alors le chemin de commandes qui mène à la place choisie.
+AI_TUCKS = True
 
-SCREEN = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption('Tetris')
+# Temps accordé à l'IA pour chaque pièce, en secondes. La recherche tourne dans un thread
+# (voir anytime.py) et le jeu continue d'afficher les images pendant ce temps.
+# None : recherche faite d'un bloc dans la boucle du jeu (seul mode qui utilise AI_WORKERS).
+AI_TIME_BUDGET = 0.1
 
+# Poids de l'évaluation : ceux de weights.json s'il a été produit par tune_weights.py
+WEIGHTS = search.load_weights()
 
-GRID = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-COLOR_GRID = [[None for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+# Enregistrer chaque partie dans replay.REPLAY_DIR (voir replay.py), avec les options de
+# recherche de l'IA pour que replay.py --diverge la rejoue pareil
+RECORD_REPLAYS = True
+AI_OPTIONS = {"tucks": AI_TUCKS, "depth": AI_DEPTH, "beam_width": AI_BEAM_WIDTH}
 
+# Ajouter chaque pièce posée par l'IA aux exemples d'apprentissage de DATASET_DIR (voir dataset.py)
+RECORD_DATASET = False
+DATASET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset")
 
-# Chemin du répertoire du script
-script_dir = os.path.dirname(os.path.abspath(__file__))
+# La simulation avance par pas fixes de fall_delay secondes, indépendamment des images affichées :
+# si plusieurs pas sont dus, ils sont tous joués avant l'image suivante (au plus MAX_STEPS_PER_FRAME,
+# le retard au-delà est abandonné). L'écran est redessiné au plus RENDER_FPS fois par seconde.
+RENDER_FPS = 60
+MAX_STEPS_PER_FRAME = 1000
+
+# Mode turbo (touche T) : les pas s'enchaînent sans attendre fall_delay et la recherche de l'IA est
+# faite d'un bloc, l'écran n'est redessiné qu'entre deux paquets de pas.
+# Pose directe (touche I) : la pièce est posée à la place choisie par l'IA en un seul pas.
+TURBO = False
+INSTANT_PLACEMENT = False
 
-# Initialisation du mixer Pygame
-pygame.mixer.init()
-drop_sound = pygame.mixer.Sound(os.path.join(script_dir, 'sounds/block_drop.wav'))
-ligne_sound = pygame.mixer.Sound(os.path.join(script_dir, 'sounds/ligne_completed.wav'))
-game_over_sound = pygame.mixer.Sound(os.path.join(script_dir, 'sounds/game_over.wav'))
-button_sound = pygame.mixer.Sound(os.path.join(script_dir, 'sounds/click_button.wav'))
 
-try:
-    pygame.mixer.music.load(os.path.join(script_dir, 'sounds/background_music.wav'))
-    # Jouer la musique en boucle
-    pygame.mixer.music.play(-1)
-except pygame.error as e:
-    print(f"Impossible de charger la musique : {e}")
+# La partie en cours (voir tetris_engine.py) : ce fichier ne fait que l'afficher et animer l'IA
+game = TetrisGame()
 
-background = pygame.image.load(os.path.join(script_dir, 'background.jpg'))
-SCREEN.blit(background, (0, 0))
 
-clock = pygame.time.Clock()
+# Chemin du répertoire du script
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Fenêtre, images et sons : créés par init() au lancement du jeu, pas à l'import du module
+SCREEN = None
+background = None
+board_layer = None
+clock = None
+sounds = {}
+
+def init():
+    global SCREEN, background, board_layer, clock, sounds
+    pygame.init()
+    SCREEN = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption('Tetris')
+    telemetry.start("tetris_ia")
+
+    background = resources.load_image(os.path.join(script_dir, 'background.jpg'))
+    SCREEN.blit(background, (0, 0))
+    board_layer = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    clock = pygame.time.Clock()
+
+    # Le son est initialisé et chargé en arrière-plan pendant les premières images
+    sounds = resources.load_sounds_async({
+        'drop': os.path.join(script_dir, 'sounds/block_drop.wav'),
+        'ligne': os.path.join(script_dir, 'sounds/ligne_completed.wav'),
+        'game_over': os.path.join(script_dir, 'sounds/game_over.wav'),
+        'button': os.path.join(script_dir, 'sounds/click_button.wav'),
+    }, music=os.path.join(script_dir, 'sounds/background_music.wav'))
 
 
 #_______________Fonctions______________________
@@ -78,30 +121,31 @@ def get_buttons():
     button_rect2 = pygame.Rect(GAME_WIDTH + 90, GAME_HEIGHT // 2, 30, 30)
 
     return button_rect1, button_rect2
-    
-def get_shape():
-    shape_type = random.choice(list(SHAPES.keys()))
-    return SHAPES[shape_type], SHAPE_COLORS[shape_type]
 
 def draw_button(button, texte):
-    font = pygame.font.Font(None, 36)
-    text = font.render(texte, True, BLACK)
+    text = resources.render_text(texte, 36, BLACK)
     text_rect = text.get_rect(center=button.center)
     pygame.draw.rect(SCREEN, WHITE, button)
     SCREEN.blit(text, text_rect)
 
+# Surfaces semi-transparentes des cases, créées une seule fois par (couleur, alpha, taille)
+BLOCK_SPRITES = {}
+
+def get_block_sprite(color, alpha, size):
+    key = (color, alpha, size)
+    sprite = BLOCK_SPRITES.get(key)
+    if sprite is None:
+        sprite = pygame.Surface(size, pygame.SRCALPHA)
+        sprite.fill(color + (alpha,))
+        BLOCK_SPRITES[key] = sprite
+    return sprite
+
 def draw_shadowed_rect(surface, color, rect, alpha):
     x, y, w, h = rect
-    shadow_color = (50, 50, 50, alpha)  # Couleur de l'ombre avec alpha
-    shape_color = color + (alpha,)  # Ajouter alpha à la couleur de la forme
+    shadow_color = (50, 50, 50)  # Couleur de l'ombre
 
-    shadow_surf = pygame.Surface((w, h), pygame.SRCALPHA)
-    shadow_surf.fill(shadow_color)
-    surface.blit(shadow_surf, (x+3, y+3))
-
-    shape_surf = pygame.Surface((w, h), pygame.SRCALPHA)
-    shape_surf.fill(shape_color)
-    surface.blit(shape_surf, (x, y))
+    surface.blit(get_block_sprite(shadow_color, alpha, (w, h)), (x+3, y+3))
+    surface.blit(get_block_sprite(color, alpha, (w, h)), (x, y))
 
     pygame.draw.line(surface, (255, 255, 255), (x, y), (x+w, y), 2)
     pygame.draw.line(surface, (255, 255, 255), (x, y), (x, y+h), 2)
@@ -119,67 +163,27 @@ def draw_shape(matrix, offset, color = WHITE, alpha = 128):
                 draw_shadowed_rect(SCREEN, color, pygame.Rect(grid_x * BLOCK_SIZE, grid_y * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE), alpha)
 
 
-def draw_grid():
+def draw_grid(surface=None):
+    if surface is None:
+        surface = SCREEN
     for y in range(GRID_HEIGHT):
         for x in range(GRID_WIDTH):
-            if GRID[y][x]:
-                color = COLOR_GRID[y][x]
-                draw_shadowed_rect(SCREEN, color, pygame.Rect(x * BLOCK_SIZE, y * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE), 128)
+            if game.board[y] >> x & 1:
+                color = game.colors[y][x]
+                draw_shadowed_rect(surface, color, pygame.Rect(x * BLOCK_SIZE, y * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE), 128)
             else:
-                pygame.draw.rect(SCREEN, GRAY, pygame.Rect(x * BLOCK_SIZE, y * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE), 1)
+                pygame.draw.rect(surface, GRAY, pygame.Rect(x * BLOCK_SIZE, y * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE), 1)
 
 
 def check_collision(grid, shape, offset):
     off_x, off_y = offset
-    for y in range(len(shape)):
-        for x in range(len(shape[0])):
-            if shape[y][x]:
-                grid_x = (off_x // BLOCK_SIZE) + x
-                grid_y = (off_y // BLOCK_SIZE) + y
-                if grid_x < 0 or grid_x >= GRID_WIDTH or grid_y >= GRID_HEIGHT or (grid_y >= 0 and grid[grid_y][grid_x]):
-                    return True
-    return False
-
-
-def rotate(shape):
-    return [ [ shape[y][x]
-            for y in range(len(shape)) ]
-            for x in range(len(shape[0]) - 1, -1, -1) ]
-
-
-def remove_line():
-    global GRID, COLOR_GRID
-
-    # Liste des indices des lignes pleines
-    full_lines = []
-    for y in range(GRID_HEIGHT):
-        if all(GRID[y][x] != 0 for x in range(GRID_WIDTH)):
-            full_lines.append(y)
-    
-    lines_removed = len(full_lines)
-
-    # Suppression des lignes pleines et ajout de nouvelles lignes vides au début
-    new_grid = [[0 for _ in range(GRID_WIDTH)] for _ in range(lines_removed)]
-    new_color_grid = [[None for _ in range(GRID_WIDTH)] for _ in range(lines_removed)]
-
-    for y in range(GRID_HEIGHT):
-        if y not in full_lines:
-            new_grid.append(GRID[y])
-            new_color_grid.append(COLOR_GRID[y])
-    
-    GRID = new_grid
-    COLOR_GRID = new_color_grid
-
-    return lines_removed
+    masks = bitboard.shape_masks(shape)
+    return bitboard.collides(grid, masks, len(shape[0]), off_x // BLOCK_SIZE, off_y // BLOCK_SIZE)
 
 
 def show_message(line1, line2):
-    font1 = pygame.font.SysFont("comicsansms", 48)
-    font2 = pygame.font.SysFont("comicsansms", 25)
-
-
-    label1 = font1.render(line1, True, WHITE)
-    label2 = font2.render(line2, True, WHITE)
+    label1 = resources.render_text(line1, 48, WHITE, "comicsansms")
+    label2 = resources.render_text(line2, 25, WHITE, "comicsansms")
 
     message_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
     message_surface.fill((0, 0, 0, 180))  # Remplir avec un fond transparent
@@ -200,10 +204,9 @@ def draw_info(score, next_shape, next_color):
     info_surface = pygame.Surface((INFO_WIDTH, INFO_HEIGHT), pygame.SRCALPHA)
     info_surface.fill((128, 128, 128, 128))
     
-    font = pygame.font.SysFont('Arial', 24)
-    text = font.render(f"Score: {score}", True, WHITE)
+    text = resources.render_text(f"Score: {score}", 24, WHITE, 'Arial')
     info_surface.blit(text, (20, 20))
-    next_text = font.render("Next:", True, WHITE)
+    next_text = resources.render_text("Next:", 24, WHITE, 'Arial')
     info_surface.blit(next_text, (20, 70))
     SCREEN.blit(info_surface, (GAME_WIDTH, 0))
 
@@ -211,192 +214,293 @@ def draw_info(score, next_shape, next_color):
 
 
 
-def calculate_score(lines_removed):
-    if lines_removed == 2:
-        return 300
-    elif lines_removed == 3:
-        return 500
-    elif lines_removed == 4:
-        return 800
-    else:
-        return lines_removed * 100 
-
-
-def calculate_heights(grid):
-    heights = [0] * len(grid[0])
-    for x in range(len(grid[0])):
-        for y in range(len(grid)):
-            if grid[y][x] != 0:
-                heights[x] = len(grid) - y
-                break
-    return heights
-
-
-def count_holes(grid):
-    holes = 0
-    for x in range(len(grid[0])):
-        block_found = False
-        for y in range(len(grid)):
-            if grid[y][x] != 0:
-                block_found = True
-            elif grid[y][x] == 0 and block_found:
-                holes += 1
-    return holes
-
-def calculate_height_disparity(heights):
-    return sum(abs(heights[i] - heights[i + 1]) for i in range(len(heights) - 1))
-
-def calculate_lines_cleared(grid):
-    lines_cleared = sum(1 for y in range(len(grid)) if all(grid[y][x] != 0 for x in range(len(grid[0]))))
-    return lines_cleared
-
 def get_possible_moves(grid, shape):
     # Prends en compte la grille et le type de pièce, et trouve les endroits où elle peut etre placé. Prends en compte les rotations de la pièce 
     # Retourne une liste avec à chaque fois la forme de la pièce (son orientation) et la position (chaque position à une abcisse et un ordonnée)
 
-    possible_moves = []
-
-    # Calculer toutes les rotations possibles de la pièce
-    rotations = [shape]
-    rotated_shape = shape
-    for _ in range(3):
-        rotated_shape = rotate(rotated_shape)
-        rotations.append(rotated_shape)
-
-    # Parcourir chaque rotation et chaque position possible où la pièce pourrait être placée
-    for current_shape in rotations:
-        shape_width = len(current_shape[0])
-        shape_height = len(current_shape)
-
-        for x in range(GRID_WIDTH - shape_width + 1):
-            y = 0
-            while y <= GRID_HEIGHT - shape_height:
-                if not check_collision(grid, current_shape, (x * BLOCK_SIZE, y * BLOCK_SIZE)):
-                    y += 1
-                else:
-                    break
-            
-            # Vérifier si la pièce peut être placée à cette position
-            if y > 0:
-                possible_moves.append((current_shape, (x * BLOCK_SIZE, (y - 1) * BLOCK_SIZE)))
-
-    return possible_moves
-
-'''
-max_height : Pénalise les colonnes trop hautes. Poids = ?.
-holes : Les trous sont très pénalisants car ils rendent le nettoyage des lignes difficile. Poids = ?.
-height_disparity : Pénalise les grandes différences de hauteur entre colonnes adjacentes. Poids = ?.
-total_height : Pénalise les hauteurs globales élevées. Poids = ?.
-lines_cleared : Favorise énormément la formation de ligne complète car elles permettent de les faire disparaitre . Poids = ?.
-'''
-
-def evaluate_move(shape, next_shape):
-    #Critères
-    weights = {
-    'max_height': -0.5,
-    'holes': -1.0,
-    'height_disparity': -0.2,
-    'total_height': -0.3,
-    'lines_cleared': 1.0
-    }
-    best_move = None
-    best_score = float('-inf')
-
-    possible_moves = get_possible_moves(GRID, shape)
-    for shape, position in possible_moves:
-        temp_grid = [row[:] for row in GRID]
-        temp_grid = simul_placement(temp_grid, shape, position)
-
-        next_moves = get_possible_moves(temp_grid, next_shape)
-        for next_shape, next_position in next_moves:
-            temp_grid2 = [row[:] for row in temp_grid]
-            temp_grid2 = simul_placement(temp_grid2, next_shape, next_position)
-            
-    
-            heights = calculate_heights(temp_grid2)
-            lines_cleared = calculate_lines_cleared(temp_grid2)
-            holes = count_holes(temp_grid2)
-            height_disparity = calculate_height_disparity(heights)
-            total_height = sum(heights)
-
-            # Calculer le score pour cette configuration
-            score = (
-                weights['max_height'] * max(heights) +
-                weights['holes'] * holes +
-                weights['height_disparity'] * height_disparity +
-                weights['total_height'] * total_height +
-                weights['lines_cleared'] * lines_cleared
-            )
-
-            if score > best_score:
-                best_score = score
-                best_move = (shape, position)
-
-    return best_move
-    
+    return [(orientation.shape, (x * BLOCK_SIZE, y * BLOCK_SIZE))
+            for orientation, x, y in search.get_placements(grid, get_orientations(shape))]
+
+
+# Cache des positions déjà rencontrées, partagé entre les pièces successives des parties.
+# Il n'est utilisé que par la boucle du jeu, jamais par les threads de recherche : les coups
+# complets trouvés en arrière-plan y sont rangés quand la boucle les récupère.
+SEARCH_CACHE = cache.SearchCache()
+
+# Recherche de l'IA en arrière-plan, utilisée quand AI_TIME_BUDGET est donné
+planner = anytime.AnytimeSearch(WEIGHTS, AI_DEPTH, AI_BEAM_WIDTH, AI_TUCKS)
+# Coup de la pièce suivante, préparé pendant que la pièce courante rejoint sa cible
+# (recherche à 2 pièces en arrière-plan uniquement)
+speculator = anytime.SpeculativePlanner(WEIGHTS, AI_TUCKS)
+SPECULATE = AI_TIME_BUDGET is not None and not AI_BEAM_WIDTH
+
+def evaluate_move(shape, next_shape, batch=False, search_cache=None, workers=0, grid=None):
+    # Meilleure position pour `shape` en tenant compte de `next_shape` (voir search.best_placement),
+    # sur `grid` ou à défaut sur la grille de la partie en cours
+    if grid is None:
+        grid = game.board
+    placement = search.best_placement(grid, piece_id(shape), piece_id(next_shape), WEIGHTS,
+                                      batch, search_cache, workers)
+    if placement is None:
+        return None
+    orientation, x, y = placement
+    return orientation.shape, (x * BLOCK_SIZE, y * BLOCK_SIZE)
+
 def simul_placement (temp_grid, shape, position):
-    # Simuler le placement de la pièce dans la grille temporaire
-    for y in range(len(shape)):
-        for x in range(len(shape[0])):
-            if shape[y][x]:
-                grid_x = (position[0] // BLOCK_SIZE) + x
-                grid_y = (position[1] // BLOCK_SIZE) + y
-                if grid_y < GRID_HEIGHT:  # Vérifier que la pièce est dans la grille
-                    temp_grid[grid_y][grid_x] = 1
-    return temp_grid
+    # Simuler le placement de la pièce dans la grille temporaire (retourne une nouvelle grille)
+    return bitboard.place(temp_grid, bitboard.shape_masks(shape), position[0] // BLOCK_SIZE, position[1] // BLOCK_SIZE)
+
+#_______________Rendu par zones______________________
+
+# Fond et cases posées, dessinés dans une surface qui n'est refaite que lorsqu'une pièce
+# est posée. À chaque image, seules les zones de la pièce qui tombe, de sa position visée
+# et du panneau d'informations sont restaurées depuis cette surface puis redessinées.
+INFO_RECT = pygame.Rect(GAME_WIDTH, 0, INFO_WIDTH, INFO_HEIGHT)
+board_layer_key = None      # (pièces posées, grille) au moment où board_layer a été dessinée
+last_frame = None           # Ce qui était affiché à l'image précédente
+last_rects = []             # Zones des pièces à l'image précédente
+full_redraw = True          # Tout l'écran doit être redessiné (départ, nouvelle partie)
+
+def shape_rect(shape, x, y):
+    # Zone de l'écran touchée par draw_shape : les cases, leur ombre (+3) et leurs bords
+    return pygame.Rect(x * BLOCK_SIZE - 1, y * BLOCK_SIZE - 1,
+                       len(shape[0]) * BLOCK_SIZE + 5, len(shape) * BLOCK_SIZE + 5)
 
 def screen_updated(button_rect1, button_rect2):
-    global GRID, COLOR_GRID, clock, current_shape, current_color, shape_pos, next_shape, next_color, score, best_move, is_moving
-    SCREEN.blit(background, (0, 0))  # Réinitialiser l'écran
-    draw_grid()
-    draw_shape(current_shape, shape_pos, current_color)
-    if (is_moving):
-        (best_shape, best_position) = best_move
-        draw_shape(best_shape, best_position, WHITE, 100)
-    draw_info(score, next_shape, next_color)
-
-
-    draw_button(button_rect1, "-")
-    draw_button(button_rect2, "+")
-    pygame.display.update()
-    clock.tick(240)  # Images par seconde
+    global board_layer_key, last_frame, last_rects, full_redraw
+    layer_key = (game.pieces, game.board)
+    if layer_key != board_layer_key:    # Pièce posée : fond et grille redessinés une fois
+        board_layer.blit(background, (0, 0))
+        draw_grid(board_layer)
+        board_layer_key = layer_key
+        full_redraw = True
+
+    ghost = best_move if is_moving else None
+    hud = telemetry.hud_surface()
+    frame = (layer_key, id(game.shape), game.x, game.y, ghost, game.score, game.next_type, hud)
+    if frame == last_frame and not full_redraw:     # Rien n'a bougé
+        telemetry.lap("render")
+        return
+
+    rects = [shape_rect(game.shape, game.x, game.y)]
+    if ghost is not None:
+        rects.append(shape_rect(ghost[0].shape, ghost[1], ghost[2]))
+
+    if full_redraw:
+        dirty = [SCREEN.get_rect()]
+        SCREEN.blit(board_layer, (0, 0))
+        info_dirty = True
+    else:
+        dirty = last_rects + rects
+        # Le panneau est semi-transparent et recouvre le bord droit de la grille :
+        # il est redessiné si son contenu change ou si une pièce le touche
+        # (ainsi que les mesures affichées par-dessus, voir telemetry.py)
+        info_dirty = (frame[5:] != last_frame[5:] or hud is not None
+                      or any(rect.colliderect(INFO_RECT) for rect in dirty))
+        if info_dirty:
+            dirty.append(INFO_RECT)
+        for rect in dirty:
+            SCREEN.blit(board_layer, rect, rect)   # Efface l'ancienne image dans cette zone
+
+    draw_shape(game.shape, (game.x * BLOCK_SIZE, game.y * BLOCK_SIZE), game.color)
+    if ghost is not None:
+        (best_orientation, best_x, best_y) = ghost
+        draw_shape(best_orientation.shape, (best_x * BLOCK_SIZE, best_y * BLOCK_SIZE), WHITE, 100)
+    if info_dirty:
+        draw_info(game.score, game.next_shape, game.next_color)
+        draw_button(button_rect1, "-")
+        draw_button(button_rect2, "+")
+        if hud is not None:
+            SCREEN.blit(hud, (GAME_WIDTH + 5, INFO_HEIGHT - hud.get_height() - 5))
+    telemetry.lap("render")
+
+    pygame.display.update(dirty)
+    telemetry.lap("display")
+    last_frame = frame
+    last_rects = rects
+    full_redraw = False
 
 def reset_game():
-    global GRID, COLOR_GRID, current_shape, current_color, next_shape, next_color, shape_pos, score, fall_time, game_over, best_move, is_moving
-    GRID = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-    COLOR_GRID = [[None for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-    current_shape, current_color = get_shape()
-    next_shape, next_color = get_shape()
-    shape_pos = [GAME_WIDTH // 2 - BLOCK_SIZE, 0]
-    score = 0
+    global fall_time, game_over, best_move, is_moving, planned_piece, full_redraw, move_path
+    game.reset()
+    if RECORD_REPLAYS:
+        game.recorder = replay.ReplayRecorder(game.seed, AI_OPTIONS)
+    full_redraw = True
+    planner.cancel()
+    speculator.cancel()
     fall_time = 0
     game_over = False
     best_move = None
     is_moving = False
+    move_path = None
+    planned_piece = -1
+
+def count_search(stats):
+    # Ajoute aux mesures les nœuds développés et grilles générées d'une recherche (voir search.best_placement)
+    telemetry.count("ai.expanded", stats['expanded'])
+    telemetry.count("ai.generated", stats['generated'])
+
+def count_cache():
+    # Ajoute aux mesures les succès et échecs de lecture de SEARCH_CACHE depuis le dernier appel
+    for name, lru in SEARCH_CACHE.caches():
+        telemetry.count(f"cache.{name}.hits", lru.hits)
+        telemetry.count(f"cache.{name}.misses", lru.misses)
+        lru.hits = lru.misses = 0
+
+def update_ai():
+    # Lance la recherche de l'IA pour une pièce qui vient d'apparaître, ou récupère son résultat
+    # dès qu'il est prêt. Ne bloque jamais quand AI_TIME_BUDGET est donné.
+    global best_move, is_moving, planned_piece, move_path
+    if AI_TIME_BUDGET is None or TURBO:
+        planned_piece = game.pieces
+        stats = {} if telemetry.ENABLED else None
+        best_move = game.ai_placement(weights=WEIGHTS, batch=True, search_cache=SEARCH_CACHE,
+                                      workers=AI_WORKERS, depth=AI_DEPTH, beam_width=AI_BEAM_WIDTH,
+                                      stats=stats, tucks=AI_TUCKS) # l'IA choisi le meilleur pos
+        if stats:
+            telemetry.count("ai.decisions")
+            count_search(stats)
+    elif planned_piece != game.pieces:
+        planned_piece = game.pieces
+        piece, next_piece = piece_id(game.shape), piece_id(game.next_shape)
+        hit, best_move = speculator.take(game.board, piece, next_piece)
+        if hit:
+            telemetry.count("ai.speculation_hits")
+            count_search(speculator.stats)
+            if not AI_BEAM_WIDTH:
+                search.store_decision(SEARCH_CACHE, game.board, piece, next_piece, WEIGHTS, best_move, AI_TUCKS)
+        else:
+            telemetry.count("ai.speculation_misses")
+            hit, best_move = search.cached_decision(SEARCH_CACHE, game.board, piece, next_piece, WEIGHTS, AI_TUCKS)
+            if AI_BEAM_WIDTH or not hit:     # Rien de prévu pour cette grille : recherche normale
+                planner.start(game.board, piece, next_piece, AI_TIME_BUDGET)
+                return
+            telemetry.count("ai.decision_cache_hits")
+    elif planner.ready():
+        telemetry.count("ai.decisions")
+        # Une recherche à 2 pièces terminée donne le coup de search.best_placement : il est mémorisé
+        complete = planner.finished and planner.level == 2 and not AI_BEAM_WIDTH
+        best_move = planner.result()
+        count_search(planner.stats)
+        if complete:
+            search.store_decision(SEARCH_CACHE, game.board, piece_id(game.shape), piece_id(game.next_shape),
+                                  WEIGHTS, best_move, AI_TUCKS)
+    else:
+        return
+    count_cache()
+
+    if best_move is not None:
+        is_moving = True
+        # Commandes qui mènent la pièce à sa place (None : mouvement direct, voir step)
+        move_path = None
+        if not INSTANT_PLACEMENT:
+            path = reachability.find_path(game.board, get_orientations(game.shape), (game.x, game.y), best_move)
+            if path is not None:
+                move_path = deque(path)
+        if SPECULATE and not TURBO:
+            speculator.start(game.board, best_move, piece_id(game.next_shape))
+    else:               # Plus aucune place pour la pièce
+        game_Over()
+
+def place_piece(shape, x, y):
+    # Pose la pièce courante et passe à la suivante
+    global best_move, is_moving, move_path
+    lines_removed = game.place(shape, x, y)
+    telemetry.count("pieces")
+    if not TURBO:
+        resources.play_sound(sounds, 'drop')
+        if (lines_removed > 0):
+            resources.play_sound(sounds, 'ligne')
+    best_move = None
+    is_moving = False
+    move_path = None
+    if game.game_over:      # La nouvelle pièce ne rentre pas
+        game_Over()
+
+def apply_move(move):
+    # Applique une commande d'un chemin de reachability.find_path à la pièce courante
+    if move == reachability.ROTATE:
+        game.shape = next_rotation(game.shape)
+    elif move == reachability.LEFT:
+        game.x -= 1
+    elif move == reachability.RIGHT:
+        game.x += 1
+    else:
+        game.y += 1
+
+def step():
+    # Un pas de la simulation : la pièce est posée si elle ne peut plus descendre,
+    # sinon elle avance d'une commande (ou directement à sa place) vers le coup de l'IA
+    global best_move, is_moving
+    # Une pièce qui suit un chemin peut reposer en chemin avant de glisser sous un surplomb
+    if game.collides(y=game.y + 1) and not move_path:   # Pièce placée
+        place_piece(game.shape, game.x, game.y)
+
+    if not game_over and not is_moving and (planned_piece != game.pieces or planner.active):
+        update_ai()
+
+    if not game_over and is_moving and best_move is not None: # mouv auto vers pos
+        best_orientation, target_x, target_y = best_move
+
+        if INSTANT_PLACEMENT:
+            place_piece(best_orientation.shape, target_x, target_y)
+            return
+        if move_path:
+            apply_move(move_path.popleft())
+            return
+
+        # Sans chemin : rotation, décalage puis descente
+        if game.shape != best_orientation.shape:
+            game.shape = next_rotation(game.shape)
+        if game.x < target_x:
+            game.x += 1
+        elif game.x > target_x:
+            game.x -= 1
+        elif game.y < target_y:
+            game.y += 1
+        else:
+            is_moving = False
+            best_move = None
+
+def set_turbo(enabled):
+    global TURBO, planned_piece
+    TURBO = enabled
+    # La recherche en cours en arrière-plan est reprise dans le nouveau mode
+    planner.cancel()
+    speculator.cancel()
+    planned_piece = -1
 
 def game_Over():
     global game_over
     show_message("Game Over", "Press space to restart")
     game_over = True
-    game_over_sound.play()
+    if game.recorder is not None and game.recorder.codes:
+        print(f"Partie enregistrée : {game.recorder.save(replay.REPLAY_DIR)}")
+    resources.play_sound(sounds, 'game_over')
 
 def main():
-    global GRID, COLOR_GRID, clock, current_shape, current_color, shape_pos, next_shape, next_color, score, fall_time, fall_delay, game_over, best_move, is_moving
-    current_shape, current_color = get_shape()
-    shape_pos = [GAME_WIDTH // 2 - BLOCK_SIZE, 0]
-    next_shape, next_color = get_shape()
+    global clock, fall_time, fall_delay, game_over, best_move, is_moving, planned_piece, INSTANT_PLACEMENT, move_path
+    init()
+    if RECORD_REPLAYS:
+        game.recorder = replay.ReplayRecorder(game.seed, AI_OPTIONS)
+    if RECORD_DATASET:
+        import dataset
+        game.dataset = dataset.DatasetWriter(DATASET_DIR)
     button_rect1, button_rect2 = get_buttons()
     
-    score = 0
     fall_time = 0
     fall_delay = 0.2
     game_over = False
-    best_move = None
+    best_move = None    # Placement (orientation, x, y) visé par l'IA, en cases
     is_moving = False
+    move_path = None    # Commandes restantes jusqu'à best_move (voir reachability.find_path)
+    planned_piece = -1  # Numéro (game.pieces) de la dernière pièce pour laquelle l'IA a cherché un coup
 
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                if game.dataset is not None:
+                    game.dataset.close()
                 pygame.quit()
                 sys.exit()
             elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
@@ -404,76 +508,53 @@ def main():
                     reset_game()
                 else:
                     game_Over()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_t:
+                set_turbo(not TURBO)
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_i:
+                INSTANT_PLACEMENT = not INSTANT_PLACEMENT
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                telemetry.toggle_hud()
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if button_rect1.collidepoint(event.pos):
                     fall_delay *= 2
                 elif button_rect2.collidepoint(event.pos):
                     fall_delay /= 2
                 #print(fall_delay)
-                button_sound.play()
+                resources.play_sound(sounds, 'button')
+
+        telemetry.lap("events")
 
         if not game_over:
-            fall_time += clock.get_time() / 1000
-            if fall_time >= fall_delay:     # Delay atteint
-                fall_time = 0
-
-                if check_collision(GRID, current_shape, shape_pos):     # Game Over
-                        game_Over()
-
-                if check_collision(GRID, current_shape, (shape_pos[0], shape_pos[1] + BLOCK_SIZE)):   # Pièce placée
-                    for y in range(len(current_shape)):
-                        for x in range(len(current_shape[0])):
-                            if current_shape[y][x]:
-                                grid_x = (shape_pos[0] // BLOCK_SIZE) + x
-                                grid_y = (shape_pos[1] // BLOCK_SIZE) + y
-                                GRID[grid_y][grid_x] = 1
-                                COLOR_GRID[grid_y][grid_x] = current_color
-                                drop_sound.play()
-                                    
-                    lines_removed = remove_line()
-                    if (lines_removed > 0):
-                        score += calculate_score(lines_removed)
-                        ligne_sound.play()
-                    
-                     
-                    # Générer une nouvelle forme
-                    current_shape = next_shape
-                    current_color = next_color
-                    next_shape, next_color = get_shape()
-                    shape_pos = [GAME_WIDTH // 2 - BLOCK_SIZE, 0]
-                    best_move = None
-                    is_moving = False
-
-                if not is_moving and best_move is None: 
-                    best_move = evaluate_move(current_shape, next_shape) # l'IA choisi le meilleur pos
-                    if best_move is not None:
-                        is_moving = True
-
-                if is_moving and best_move is not None: # mouv auto vers pos
-                    best_shape, best_position = best_move
-                    target_x, target_y = best_position
-
-                    if current_shape != best_shape:
-                        current_shape = rotate(current_shape)
-                    if shape_pos[0] < target_x:
-                        shape_pos[0] += BLOCK_SIZE
-                    elif shape_pos[0] > target_x:
-                        shape_pos[0] -= BLOCK_SIZE
-                    elif shape_pos[1] < target_y:
-                        shape_pos[1] += BLOCK_SIZE
-                    else:
-                        is_moving = False
-                        best_move = None
+            if TURBO:
+                # Pas enchaînés jusqu'à l'heure de l'image suivante
+                frame_end = time.perf_counter() + 1 / RENDER_FPS
+                while not game_over and time.perf_counter() < frame_end:
+                    step()
+                telemetry.lap("simulation")
+            else:
+                fall_time += clock.get_time() / 1000
+                steps = 0
+                while fall_time >= fall_delay and not game_over:    # Delay atteint
+                    fall_time -= fall_delay
+                    step()
+                    steps += 1
+                    if steps == MAX_STEPS_PER_FRAME:
+                        fall_time = 0
+                        break
+                telemetry.lap("simulation")
+
+                # Consulté à chaque image : le coup est pris dès qu'il est prêt, sans attendre le prochain pas
+                if not game_over and not is_moving and (planned_piece != game.pieces or planner.active):
+                    update_ai()
+                telemetry.lap("ai")
 
+        if not game_over:
             screen_updated(button_rect1, button_rect2)
-
+            resources.first_frame_shown()
+        # En turbo, le temps d'une image est déjà passé à simuler ; l'écran de fin reste à RENDER_FPS
+        clock.tick(0 if TURBO and not game_over else RENDER_FPS)
+        telemetry.lap("idle")
+        telemetry.end_frame()
 
 if __name__ == "__main__":
     main()
-
-
-
-
-
-
-
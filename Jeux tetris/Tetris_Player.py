@@ -3,8 +3,14 @@ import sys
 import random
 import os
 
-# Initialisation de Pygame
-pygame.init()
+import bitboard
+import replay
+from pieces import piece_id
+
+# Ressources partagées entre les jeux (resources.py, à la racine du dépôt)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import resources
+import telemetry
 
 # Définir les dimensions de la fenêtre et les couleurs
 SCREEN_WIDTH = 300
@@ -42,10 +48,13 @@ SHAPES = {
 }
 
 
-# Initialiser l'écran et définir le titre de la fenêtre
-SCREEN = pygame.display.set_mode((SCREEN_WIDTH + INFO_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption('Tetris')
+# Enregistrer chaque partie dans replay.REPLAY_DIR (voir replay.py)
+RECORD_REPLAYS = True
 
+# Générateur des pièces de la partie en cours et enregistrement de ses placements : les pièces
+# sont tirées comme dans tetris_engine.TetrisGame, la partie peut être rejouée à partir de la graine
+rng = random.Random()
+recorder = None
 
 # Initialisation de la grille principale et de la grille de couleurs
 GRID = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
@@ -55,20 +64,44 @@ COLOR_GRID = [[None for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
 # Chemin du répertoire du script
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
-# Initialisation du mixer Pygame
-pygame.mixer.init()
-drop_sound = pygame.mixer.Sound(os.path.join(script_dir, 'sounds/block_drop.wav'))
-background = pygame.image.load(os.path.join(script_dir, 'background.jpg'))
-SCREEN.blit(background, (0, 0))
+# Fenêtre, image de fond et sons : créés par init() au lancement du jeu, pas à l'import du module
+SCREEN = None
+background = None
+sounds = {}
+
+def init():
+    global SCREEN, background, sounds
+    # Initialisation de Pygame
+    pygame.init()
+    # Initialiser l'écran et définir le titre de la fenêtre
+    SCREEN = pygame.display.set_mode((SCREEN_WIDTH + INFO_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption('Tetris')
+    telemetry.start("tetris_player")
+
+    background = resources.load_image(os.path.join(script_dir, 'background.jpg'))
+    SCREEN.blit(background, (0, 0))
+    # Le son est initialisé et chargé en arrière-plan pendant les premières images
+    sounds = resources.load_sounds_async({'drop': os.path.join(script_dir, 'sounds/block_drop.wav')})
 
 
 
 #_______________Fonctions______________________
 
 def get_shape():
-    shape_type = random.choice(list(SHAPES.keys()))
+    shape_type = rng.choice(list(SHAPES.keys()))
     return SHAPES[shape_type], SHAPE_COLORS[shape_type]
 
+def new_game_seed():
+    # Nouvelle graine pour les pièces de la partie qui commence, et nouvel enregistrement
+    global recorder
+    seed = random.randrange(1 << 32)
+    rng.seed(seed)
+    recorder = replay.ReplayRecorder(seed) if RECORD_REPLAYS else None
+
+def save_replay():
+    if recorder is not None and recorder.codes:
+        print(f"Partie enregistrée : {recorder.save(replay.REPLAY_DIR)}")
+
 """
 def test(matrix):
     for i in range(len(matrix)):
@@ -155,12 +188,8 @@ def remove_line():
 
 
 def show_message(line1, line2):
-    font1 = pygame.font.SysFont("comicsansms", 48)
-    font2 = pygame.font.SysFont("comicsansms", 25)
-
-
-    label1 = font1.render(line1, True, WHITE)
-    label2 = font2.render(line2, True, WHITE)
+    label1 = resources.render_text(line1, 48, WHITE, "comicsansms")
+    label2 = resources.render_text(line2, 25, WHITE, "comicsansms")
 
     message_surface = pygame.Surface((SCREEN_WIDTH, label1.get_height() + label2.get_height()), pygame.SRCALPHA)
     message_surface.fill((0, 0, 0, 180))  # Remplir avec un fond transparent
@@ -179,10 +208,9 @@ def draw_info(score):
     info_surface = pygame.Surface((INFO_WIDTH, INFO_HEIGHT), pygame.SRCALPHA)
     info_surface.fill((128, 128, 128, 128))  # Couleur grise avec alpha à 128 (semi-transparent)
     
-    font = pygame.font.SysFont('Arial', 24)
-    text = font.render(f"Score: {score}", True, WHITE)
+    text = resources.render_text(f"Score: {score}", 24, WHITE, 'Arial')
     info_surface.blit(text, (20, 20))
-    next_text = font.render("Next:", True, WHITE)
+    next_text = resources.render_text("Next:", 24, WHITE, 'Arial')
     info_surface.blit(next_text, (20, 70))
 
     SCREEN.blit(info_surface, (GAME_WIDTH, 0))
@@ -202,6 +230,7 @@ def reset_game():
     global GRID, COLOR_GRID, current_shape, current_color, next_shape, next_color, shape_pos, score, fall_time, game_over
     GRID = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
     COLOR_GRID = [[None for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+    new_game_seed()
     current_shape, current_color = get_shape()
     next_shape, next_color = get_shape()
     shape_pos = [SCREEN_WIDTH // 2 - BLOCK_SIZE, 0]
@@ -211,7 +240,9 @@ def reset_game():
 
 def main():
     global GRID, COLOR_GRID, current_shape, current_color, next_shape, next_color, shape_pos, score, fall_time, game_over
+    init()
     clock = pygame.time.Clock()
+    new_game_seed()
     current_shape, current_color = get_shape()  # Type de la pièce courante et sa couleur
     shape_pos = [SCREEN_WIDTH // 2 - BLOCK_SIZE, 0]     #position départ
     next_shape, next_color = get_shape()
@@ -234,6 +265,11 @@ def main():
                     new_pos[0] += BLOCK_SIZE
                 elif event.key == pygame.K_DOWN:
                     new_pos[1] += BLOCK_SIZE
+                elif event.key == pygame.K_RETURN:    # Chute immédiate
+                    orientation = bitboard.make_orientation(current_shape)
+                    drop_y = bitboard.drop_position(bitboard.from_grid(GRID), orientation, shape_pos[0] // BLOCK_SIZE, y=shape_pos[1] // BLOCK_SIZE)
+                    if drop_y >= 0:
+                        new_pos[1] = drop_y * BLOCK_SIZE
                 elif event.key == pygame.K_UP:
                     new_shape = rotate(current_shape)
                     if not check_collision(new_shape, shape_pos):
@@ -241,11 +277,16 @@ def main():
                 if not check_collision(current_shape, new_pos):
                     shape_pos = new_pos
 
-                if event.key == pygame.K_SPACE and game_over:
+                if event.key == pygame.K_F3:
+                    telemetry.toggle_hud()
+                elif event.key == pygame.K_SPACE and game_over:
                     reset_game()
                 elif event.key == pygame.K_SPACE and not game_over:
                     show_message("Game Over", "Presse espace to restart")
                     game_over = True
+                    save_replay()
+
+        telemetry.lap("events")
 
         if not game_over:
             # Temps écoulé depuis le dernier appel de tick() en secondes
@@ -257,6 +298,8 @@ def main():
                 if not check_collision(current_shape, new_pos):
                     shape_pos = new_pos
                 else:
+                    if recorder is not None:
+                        recorder.record(piece_id(current_shape), shape_pos[0] // BLOCK_SIZE, shape_pos[1] // BLOCK_SIZE)
                     # Mise à jour de la grille
                     for y in range(len(current_shape)):
                         for x in range(len(current_shape[0])):
@@ -268,7 +311,7 @@ def main():
                                 
                     lines_removed = remove_line()
                     score += calculate_score(lines_removed)
-                    drop_sound.play()
+                    resources.play_sound(sounds, 'drop')
 
                     # Générer une nouvelle forme
                     current_shape = next_shape
@@ -280,8 +323,11 @@ def main():
                     if check_collision(current_shape, shape_pos):
                         show_message("Game Over", "Presse espace to restart")
                         game_over = True
+                        save_replay()
+
 
 
+        telemetry.lap("update")
 
         if not game_over:
             # Dessiner la grille et la pièce courante
@@ -290,11 +336,15 @@ def main():
             draw_shape(current_shape, shape_pos, current_color)
             draw_info(score)
             draw_shape(next_shape, (GAME_WIDTH + 40, GAME_HEIGHT // 4), next_color)  # Positionner la prochaine pièce
-
-
+            telemetry.draw_hud(SCREEN)
+        telemetry.lap("render")
 
         pygame.display.update()
+        telemetry.lap("display")
+        resources.first_frame_shown()
         clock.tick(30)  # Limiter l'actualisation à 30 images par seconde
+        telemetry.lap("idle")
+        telemetry.end_frame()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
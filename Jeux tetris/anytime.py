@@ -0,0 +1,195 @@
+# Recherche de l'IA dans un thread, interrompue à une échéance.
+# La boucle du jeu lance la recherche puis continue d'afficher les images : elle ne lit
+# le résultat que lorsque la recherche est finie ou que le temps accordé est écoulé,
+# et prend alors le meilleur coup trouvé jusque-là. Ce module n'importe pas pygame.
+#
+# La recherche s'approfondit par étapes, chacune publiant son meilleur coup :
+# 1. la pièce seule (quasi immédiat),
+# 2. la pièce et la suivante, premiers coups du plus prometteur au moins prometteur :
+#    une fois terminée, le coup est exactement celui de search.best_placement,
+# 3. si une largeur de faisceau est donnée, search.beam_placement sur `depth` pièces.
+
+import threading
+import time
+
+import bitboard
+import search
+from pieces import orientations_from
+
+
+class AnytimeSearch:
+
+    def __init__(self, weights=search.WEIGHTS, depth=3, beam_width=0, tucks=False):
+        self.weights = weights
+        self.depth = depth
+        self.beam_width = beam_width
+        self.tucks = tucks      # Coups sous les surplombs aux étapes 1 et 2 (voir search.get_placements)
+        self.lock = threading.Lock()
+        self.generation = 0     # Incrémenté à chaque recherche : les threads d'une recherche abandonnée s'arrêtent
+        self.active = False     # Une recherche a été lancée et son résultat pas encore lu
+        self.best = None        # Meilleur placement (orientation, x, y) trouvé jusqu'ici
+        self.level = 0          # Étape qui a produit `best` (0 : rien encore)
+        self.finished = False
+        self.deadline = 0.0
+        self.stats = None       # Nœuds développés et grilles générées par la dernière recherche (voir search.best_placement)
+
+    def start(self, board, piece, next_piece, budget):
+        # Lance la recherche du coup de `piece` (voir pieces.piece_id), avec `budget` secondes
+        with self.lock:
+            self.generation += 1
+            self.best = None
+            self.level = 0
+            self.finished = False
+            self.active = True
+            self.deadline = time.perf_counter() + budget
+            # Rempli par le thread de cette recherche seulement, à lire après result()
+            self.stats = {'decisions': 0, 'expanded': 0, 'generated': 0}
+            args = (self.generation, board, piece, next_piece, self.deadline, self.stats)
+        threading.Thread(target=self._run, args=args, daemon=True).start()
+
+    def cancel(self):
+        with self.lock:
+            self.generation += 1
+            self.active = False
+
+    def ready(self):
+        # Vrai quand la recherche est finie, ou quand l'échéance est passée et qu'un coup est connu
+        return self.finished or (self.level > 0 and time.perf_counter() >= self.deadline)
+
+    def result(self):
+        # Arrête la recherche et retourne le meilleur coup trouvé (None : la pièce ne rentre nulle part)
+        with self.lock:
+            self.generation += 1
+            self.active = False
+            return self.best
+
+    def _publish(self, generation, placement, level, finished=False):
+        with self.lock:
+            if generation != self.generation:
+                return False
+            self.best = placement
+            self.level = level
+            self.finished = finished
+            return True
+
+    def _run(self, generation, board, piece, next_piece, deadline, stats):
+        def stopped():
+            return generation != self.generation or time.perf_counter() > deadline
+
+        weights = self.weights
+        placements = search.get_placements(board, orientations_from(piece), tucks=self.tucks)
+        stats['expanded'] += 1
+        stats['generated'] += len(placements)
+        if not placements:
+            self._publish(generation, None, 1, finished=True)
+            return
+
+        # 1. La pièce seule : les coups sont ensuite examinés dans l'ordre de ce score
+        state = bitboard.BoardState(board)
+        greedy = []
+        for placement in placements:
+            state.place(*placement)
+            greedy.append(state.score(weights))
+            state.undo()
+        order = sorted(range(len(placements)), key=lambda i: -greedy[i])
+        self._publish(generation, placements[order[0]], 1)
+
+        # 2. La pièce et la suivante. À score égal, le coup retenu est celui qui vient en
+        # premier dans l'ordre de get_placements, comme dans la recherche complète.
+        best = None
+        best_score = float('-inf')
+        scores = search.iter_branch_scores(board, [placements[i] for i in order],
+                                           orientations_from(next_piece), weights, self.tucks, stats)
+        for i, score in zip(order, scores):
+            if stopped():
+                return
+            if score > best_score or (score == best_score and best is not None and i < best):
+                best = i
+                best_score = score
+                self._publish(generation, placements[i], 1)
+        placement = placements[best] if best is not None else None
+        if not self.beam_width or placement is None:
+            self._publish(generation, placement, 2, finished=True)
+            return
+        self._publish(generation, placement, 2)
+
+        # 3. Recherche en faisceau, gardée seulement si elle se termine avant l'échéance
+        placement = search.beam_placement(board, piece, next_piece, weights, self.depth, self.beam_width,
+                                          stats, deadline)
+        if placement is not None and not stopped():
+            self._publish(generation, placement, self.depth, finished=True)
+        else:
+            with self.lock:
+                if generation == self.generation:
+                    self.finished = True
+
+
+class SpeculativePlanner:
+    # Pendant que la pièce courante rejoint sa cible, calcule dans un thread le coup de la
+    # pièce suivante sur la grille telle qu'elle sera après ce placement.
+    # La pièce qui viendra ensuite n'est pas encore connue : le coup est calculé pour chacune
+    # des 7 possibles, et celui de la pièce réellement tirée est pris à son apparition.
+    # Il est alors identique au coup de search.best_placement sur la vraie grille.
+
+    def __init__(self, weights=search.WEIGHTS, tucks=False):
+        self.weights = weights
+        self.tucks = tucks
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.board = None       # Grille prévue après le placement en cours
+        self.piece = None       # Pièce pour laquelle le coup est calculé
+        self.decisions = None   # Coup par type de la pièce qui la suit, une fois le calcul fini
+        self.stats = None       # Nœuds développés et grilles générées pour la dernière prévision
+
+    def start(self, board, placement, piece):
+        # `placement` (orientation, x, y) est le coup en cours sur `board`, `piece` la pièce suivante
+        orientation, x, y = placement
+        future, _ = bitboard.clear_lines(bitboard.place(board, orientation.masks, x, y))
+        with self.lock:
+            self.generation += 1
+            self.board = future
+            self.piece = piece
+            self.decisions = None
+            # Rempli par le thread de cette prévision seulement, à lire après take()
+            self.stats = {'expanded': 0, 'generated': 0}
+            args = (self.generation, future, piece, self.stats)
+        threading.Thread(target=self._run, args=args, daemon=True).start()
+
+    def cancel(self):
+        with self.lock:
+            self.generation += 1
+            self.board = None
+            self.decisions = None
+
+    def take(self, board, piece, next_piece):
+        # Coup prévu pour `piece` sur `board` avec `next_piece` ensuite : (True, coup) si la
+        # prévision est finie et correspond au jeu, (False, None) sinon (elle est alors abandonnée).
+        with self.lock:
+            hit = self.decisions is not None and board == self.board and piece == self.piece
+            decision = self.decisions[next_piece[0]] if hit else None
+            self.generation += 1
+            self.board = None
+            self.decisions = None
+        return hit, decision
+
+    def _run(self, generation, board, piece, stats):
+        placements = search.get_placements(board, orientations_from(piece), tucks=self.tucks)
+        stats['expanded'] += 1
+        stats['generated'] += len(placements)
+        decisions = {}
+        for key in search.ORIENTATIONS:
+            best = None
+            best_score = float('-inf')
+            scores = search.iter_branch_scores(board, placements, orientations_from((key, 0)), self.weights,
+                                               self.tucks, stats)
+            for i, score in enumerate(scores):
+                if generation != self.generation:
+                    return
+                # Premier coup de meilleur score, comme search.best_placement
+                if score > best_score:
+                    best = i
+                    best_score = score
+            decisions[key] = placements[best] if best is not None else None
+        with self.lock:
+            if generation == self.generation:
+                self.decisions = decisions
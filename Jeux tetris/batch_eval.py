@@ -0,0 +1,101 @@
+# Évaluation vectorisée (NumPy) d'un lot de grilles bitboard.
+# Toutes les grilles sont empilées dans un tableau (N, GRID_HEIGHT) de masques de lignes
+# et les critères de l'IA sont calculés pour toutes en quelques opérations, sans boucle Python.
+
+import numpy as np
+
+from bitboard import GRID_WIDTH, GRID_HEIGHT, FULL, POPCOUNT
+from pieces import ORIENTATIONS
+
+# Nombre de cases occupées pour chaque masque de ligne, en tableau NumPy
+ROW_POPCOUNT = np.array(POPCOUNT, dtype=np.int32)
+
+PIECE_TYPES = list(ORIENTATIONS)
+TYPE_INDEX = {key: t for t, key in enumerate(PIECE_TYPES)}
+
+# Coups de chaque type de pièce lâchée tout droit depuis le haut de la grille : (orientation, x),
+# dans l'ordre de search.get_placements
+MOVES = [[(o, x) for o in ORIENTATIONS[key] for x in range(GRID_WIDTH - o.width + 1)] for key in PIECE_TYPES]
+MAX_MOVES = max(len(moves) for moves in MOVES)
+
+# Masques des 4 lignes de chaque coup, décalés en colonne x ; 0 pour les lignes sous la pièce
+# et pour les numéros de coup au-delà de ceux de la pièce (ces coups ne rentrent jamais)
+MOVE_MASKS = np.zeros((len(PIECE_TYPES), MAX_MOVES, 4), dtype=np.int32)
+for t, moves in enumerate(MOVES):
+    for i, (o, x) in enumerate(moves):
+        MOVE_MASKS[t, i, :o.height] = [mask << x for mask in o.masks]
+
+# Lignes pleines ajoutées sous la grille : une pièce qui dépasse le bas de la grille la chevauche
+FLOOR = np.full(4, FULL, dtype=np.int32)
+
+
+def score_boards(boards, weights):
+    # Score de chaque grille, calculé exactement comme dans evaluate_move.
+    # Tout est fait sur le tableau (N, GRID_HEIGHT) des masques de lignes, sans dépiler les cases.
+    rows = np.array(boards, dtype=np.int32)
+
+    # `covered` marque, ligne par ligne, les colonnes dont le sommet est sur ou au-dessus de la ligne
+    covered = np.bitwise_or.accumulate(rows, axis=1)
+
+    # La hauteur d'une colonne est le nombre de lignes où elle est couverte,
+    # et un trou est une case vide dans une colonne couverte
+    total_height = ROW_POPCOUNT[covered].sum(axis=1)
+    max_height = np.count_nonzero(covered, axis=1)
+    holes = ROW_POPCOUNT[covered & ~rows].sum(axis=1)
+    lines_cleared = np.count_nonzero(rows == FULL, axis=1)
+    # |h[x] - h[x + 1]| est le nombre de lignes où une seule des deux colonnes est couverte
+    height_disparity = ROW_POPCOUNT[(covered ^ (covered >> 1)) & (FULL >> 1)].sum(axis=1)
+
+    return (
+        weights['max_height'] * max_height +
+        weights['holes'] * holes +
+        weights['height_disparity'] * height_disparity +
+        weights['total_height'] * total_height +
+        weights['lines_cleared'] * lines_cleared
+    )
+
+
+def best_board(boards, weights):
+    # Indice de la meilleure grille (la première en cas d'égalité), -1 si le lot est vide
+    if not boards:
+        return -1
+    return int(np.argmax(score_boards(boards, weights)))
+
+
+#_______________Placements en lot______________________
+
+def windows(rows):
+    # (N, GRID_HEIGHT) -> (N, GRID_HEIGHT + 1, 4) : les 4 lignes couvertes par une pièce en ligne y,
+    # jusqu'à y = GRID_HEIGHT où toute pièce chevauche le fond
+    padded = np.concatenate([rows, np.broadcast_to(FLOOR, (len(rows), 4))], axis=1)
+    return np.stack([padded[:, r:r + GRID_HEIGHT + 1] for r in range(4)], axis=2)
+
+
+def drop_rows(rows, masks):
+    # Ligne où s'arrête chaque pièce lâchée depuis le haut, -1 si elle ne rentre pas.
+    # `masks` (N, K, 4) : K pièces par grille. La collision est testée pour toutes les lignes
+    # à la fois, et la pièce s'arrête juste avant la première ligne où elle chevauche.
+    # Les numéros de coup sans pièce (masques à 0) ne chevauchent jamais rien : -1 aussi.
+    hits = (windows(rows)[:, None] & masks[:, :, None]).any(axis=3)
+    return np.where(hits.any(axis=2), hits.argmax(axis=2), 0) - 1
+
+
+def placed_rows(rows, masks, y):
+    # Grilles (N, K, GRID_HEIGHT) obtenues en posant chaque pièce `masks` (N, K, 4) en ligne y (N, K)
+    offset = np.arange(GRID_HEIGHT) - y[..., None]
+    inside = (offset >= 0) & (offset < 4)
+    cells = np.take_along_axis(masks, np.where(inside, offset, 0), axis=2)
+    return rows[:, None] | np.where(inside, cells, 0)
+
+
+def drop_scores(boards, piece_types, weights):
+    # Score (score_boards, sans suppression des lignes) de chaque coup de search.get_placements,
+    # pour chaque grille et chaque type de pièce (clés de pieces.ORIENTATIONS) :
+    # tableau (N, len(piece_types), MAX_MOVES), -inf pour les coups qui ne rentrent pas
+    rows = np.array(boards, dtype=np.int32)
+    types = [TYPE_INDEX[key] for key in piece_types]
+    masks = np.broadcast_to(MOVE_MASKS[types].reshape(1, -1, 4), (len(rows), len(types) * MAX_MOVES, 4))
+    y = drop_rows(rows, masks)
+    scores = score_boards(placed_rows(rows, masks, y).reshape(-1, GRID_HEIGHT), weights)
+    scores = np.where(y >= 0, scores.reshape(y.shape), -np.inf)
+    return scores.reshape(len(rows), len(types), MAX_MOVES)
@@ -0,0 +1,237 @@
+# Représentation compacte de la grille de Tetris.
+# Chaque ligne est un entier dont le bit x vaut 1 si la case (x, y) est occupée,
+# et une grille est un tuple de GRID_HEIGHT entiers (ligne 0 en haut).
+# Une pièce est décrite par le masque de chacune de ses lignes : la collision
+# devient quelques ET binaires, le placement quelques OU, et une ligne pleine
+# se teste avec `row == FULL`.
+
+from collections import namedtuple
+from operator import sub
+
+GRID_WIDTH = 10
+GRID_HEIGHT = 20
+FULL = (1 << GRID_WIDTH) - 1
+EMPTY_BOARD = (0,) * GRID_HEIGHT
+
+# Nombre de bits à 1 et liste des colonnes occupées pour chaque masque de ligne possible
+POPCOUNT = [bin(i).count("1") for i in range(FULL + 1)]
+BITS = [tuple(x for x in range(GRID_WIDTH) if i >> x & 1) for i in range(FULL + 1)]
+
+
+def from_grid(grid):
+    # Convertit une grille liste de listes (0 / non nul) en tuple de masques
+    return tuple(sum(1 << x for x, cell in enumerate(row) if cell) for row in grid)
+
+
+def shape_masks(shape):
+    # Masques des lignes d'une pièce, colonne 0 de la pièce sur le bit 0
+    return tuple(sum(1 << x for x, cell in enumerate(row) if cell) for row in shape)
+
+
+# Une orientation de pièce : sa matrice, les masques de ses lignes, ses dimensions et,
+# pour chaque colonne, l'indice de sa case la plus basse (profil du dessous), de sa case
+# la plus haute et son nombre de cases
+Orientation = namedtuple("Orientation", ["shape", "masks", "width", "height", "bottom", "top", "counts"])
+
+
+def make_orientation(shape):
+    columns = [[y for y in range(len(shape)) if shape[y][x]] for x in range(len(shape[0]))]
+    bottom = tuple(max(cells) for cells in columns)
+    top = tuple(min(cells) for cells in columns)
+    counts = tuple(len(cells) for cells in columns)
+    return Orientation(shape, shape_masks(shape), len(shape[0]), len(shape), bottom, top, counts)
+
+
+def unique_orientations(shape, rotate):
+    # Orientations distinctes de la pièce, dans l'ordre des rotations successives
+    orientations = []
+    current = shape
+    for _ in range(4):
+        if all(o.shape != current for o in orientations):
+            orientations.append(make_orientation(current))
+        current = rotate(current)
+    return orientations
+
+
+def shape_key(shape):
+    return tuple(map(tuple, shape))
+
+
+def collides(board, masks, width, x, y):
+    if x < 0 or x + width > GRID_WIDTH or y + len(masks) > GRID_HEIGHT:
+        return True
+    for r, mask in enumerate(masks):
+        if y + r >= 0 and board[y + r] & (mask << x):
+            return True
+    return False
+
+
+def place(board, masks, x, y):
+    # Retourne une nouvelle grille avec la pièce posée en (x, y)
+    h = len(masks)
+    placed = tuple(board[y + r] | (mask << x) for r, mask in enumerate(masks))
+    return board[:y] + placed + board[y + h:]
+
+
+def clear_lines(board):
+    # Supprime les lignes pleines, retourne la nouvelle grille et le nombre de lignes supprimées
+    kept = tuple(row for row in board if row != FULL)
+    removed = GRID_HEIGHT - len(kept)
+    return (0,) * removed + kept, removed
+
+
+def column_heights(board):
+    return features(board)[0]
+
+
+def features(board, top=0):
+    # Hauteur de chaque colonne et nombre de trous.
+    # Une case vide est un trou si une case occupée se trouve au-dessus d'elle, donc
+    # trous = somme des hauteurs - nombre de cases occupées, et le parcours peut
+    # s'arrêter dès que toutes les colonnes ont trouvé leur sommet.
+    # Les `top` premières lignes, connues vides, ne sont pas parcourues.
+    rows = board[top:]
+    heights = [0] * GRID_WIDTH
+    covered = 0
+    y = GRID_HEIGHT - top
+    for row in rows:
+        new = row & ~covered
+        if new:
+            for x in BITS[new]:
+                heights[x] = y
+            covered |= row
+            if covered == FULL:
+                break
+        y -= 1
+    holes = sum(heights) - sum(map(POPCOUNT.__getitem__, rows))
+    return heights, holes
+
+
+def bumpiness(heights):
+    return sum(map(abs, map(sub, heights, heights[1:])))
+
+
+def drop_position(board, orientation, x, heights=None, y=0):
+    # Ligne où s'arrête la pièce lâchée depuis la ligne y en colonne x, -1 si elle ne rentre pas.
+    # La pièce touche d'abord la colonne où l'écart entre le sommet de la pile et
+    # le dessous de la pièce est le plus petit : pas besoin de descendre ligne par ligne.
+    if heights is None:
+        heights = column_heights(board)
+    landing = min(GRID_HEIGHT - 1 - heights[x + c] - b for c, b in enumerate(orientation.bottom))
+    if landing >= y:
+        return landing
+
+    # La pièce est déjà sous le sommet d'une de ses colonnes (sous un surplomb, ou grille
+    # qui déborde) : on revient à la descente ligne par ligne
+    masks, width = orientation.masks, orientation.width
+    if collides(board, masks, width, x, y):
+        return -1
+    while not collides(board, masks, width, x, y + 1):
+        y += 1
+    return y
+
+
+def place_heights(heights, orientation, x, y):
+    # Hauteurs des colonnes après avoir posé la pièce en (x, y)
+    new_heights = heights[:]
+    for c, t in enumerate(orientation.top):
+        new_heights[x + c] = max(new_heights[x + c], GRID_HEIGHT - y - t)
+    return new_heights
+
+
+class BoardState:
+    # Grille modifiable dont les critères de l'IA (hauteurs, trous par colonne, écarts de
+    # hauteur, lignes pleines) sont tenus à jour à chaque placement au lieu d'être
+    # recalculés sur toute la grille. Chaque placement peut être annulé avec undo(),
+    # ce qui permet à la recherche de jouer puis défaire les coups sans copier de grille.
+
+    def __init__(self, board=EMPTY_BOARD):
+        self.history = []
+        self._reset(board)
+
+    def _reset(self, board):
+        self.rows = list(board)
+        self.heights, _ = features(board)
+        self.holes = [0] * GRID_WIDTH
+        for x in range(GRID_WIDTH):
+            bit = 1 << x
+            cells = sum(1 for row in board if row & bit)
+            self.holes[x] = self.heights[x] - cells
+        self.total_holes = sum(self.holes)
+        self.bumpiness = bumpiness(self.heights)
+        self.max_height = max(self.heights)
+        self.total_height = sum(self.heights)
+        self.full_rows = board.count(FULL)
+
+    def board(self):
+        return tuple(self.rows)
+
+    def place(self, orientation, x, y):
+        # Pose la pièce en (x, y). Seules les colonnes touchées par la pièce sont mises à jour.
+        rows = self.rows
+        heights = self.heights
+        holes = self.holes
+        width = orientation.width
+        first = x - 1 if x > 0 else 0
+        last = x + width if x + width < GRID_WIDTH else GRID_WIDTH - 1
+
+        self.history.append((orientation, x, y, heights[x:x + width], holes[x:x + width],
+                             self.total_holes, self.bumpiness, self.max_height,
+                             self.total_height, self.full_rows))
+
+        for r, mask in enumerate(orientation.masks):
+            row = rows[y + r] | (mask << x)
+            rows[y + r] = row
+            if row == FULL:
+                self.full_rows += 1
+
+        bump = 0
+        for i in range(first, last):
+            bump -= abs(heights[i] - heights[i + 1])
+        for c in range(width):
+            old_height = heights[x + c]
+            new_height = GRID_HEIGHT - y - orientation.top[c]
+            if new_height < old_height:
+                new_height = old_height
+            # trous de la colonne = hauteur - nombre de cases occupées
+            hole_delta = new_height - old_height - orientation.counts[c]
+            heights[x + c] = new_height
+            holes[x + c] += hole_delta
+            self.total_holes += hole_delta
+            self.total_height += new_height - old_height
+            if new_height > self.max_height:
+                self.max_height = new_height
+        for i in range(first, last):
+            bump += abs(heights[i] - heights[i + 1])
+        self.bumpiness += bump
+
+    def clear_lines(self):
+        # Supprime les lignes pleines. Contrairement aux placements, les critères sont
+        # recalculés sur toute la grille : cela n'arrive au plus qu'une fois par pièce jouée.
+        board, removed = clear_lines(tuple(self.rows))
+        if removed:
+            self.history.append((None, tuple(self.rows)))
+            self._reset(board)
+        return removed
+
+    def undo(self):
+        record = self.history.pop()
+        if record[0] is None:
+            self._reset(record[1])
+            return
+        (orientation, x, y, heights, holes, self.total_holes, self.bumpiness,
+         self.max_height, self.total_height, self.full_rows) = record
+        for r, mask in enumerate(orientation.masks):
+            self.rows[y + r] ^= mask << x
+        self.heights[x:x + orientation.width] = heights
+        self.holes[x:x + orientation.width] = holes
+
+    def score(self, weights):
+        # Même formule que evaluate_move, en temps constant
+        return (
+            weights['max_height'] * self.max_height +
+            weights['holes'] * self.total_holes +
+            weights['height_disparity'] * self.bumpiness +
+            weights['total_height'] * self.total_height +
+            weights['lines_cleared'] * self.full_rows
+        )
@@ -0,0 +1,78 @@
+# Caches bornés utilisés par la recherche de l'IA.
+# Une position de grille est identifiée par le tuple de ses masques de lignes (voir bitboard.py),
+# ce qui en fait une clé de dictionnaire exacte et compacte.
+
+from collections import OrderedDict
+
+# Valeur par défaut de LRUCache.get pour distinguer une entrée absente d'une entrée qui vaut None
+MISSING = object()
+
+
+class LRUCache:
+    # Dictionnaire borné à max_entries entrées (un nombre d'entrées, pas d'octets) : quand il est
+    # plein, l'entrée utilisée le moins récemment est supprimée. Compte les succès et les échecs
+    # de lecture dans hits et misses ; c'est au lecteur de les remettre à zéro (voir Tetris_IA.count_cache).
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class SearchCache:
+    # Les caches de la recherche, chacun borné en nombre d'entrées, pas en octets. Mémoire mesurée
+    # en cours de partie, clés et valeurs comprises : environ 2,2 Ko par entrée de moves, 0,33 Ko
+    # par entrée de scores et 0,45 Ko par entrée de decisions, soit au plus 110 Mo environ avec
+    # les bornes par défaut (44 + 66 + 2) :
+    # - moves : listes de coups possibles, par (grille, pièce)
+    # - scores : scores des grilles feuilles, par grille
+    # - decisions : meilleur coup déjà calculé, par (grille, pièce, pièce suivante)
+    # Les scores et les décisions dépendent des poids de l'évaluation : le cache est lié aux
+    # poids de la dernière recherche (voir bind), et vidé quand une recherche en utilise d'autres.
+
+    def __init__(self, max_move_entries=20000, max_score_entries=200000, max_decision_entries=5000):
+        self.moves = LRUCache(max_move_entries)
+        self.scores = LRUCache(max_score_entries)
+        self.decisions = LRUCache(max_decision_entries)
+        self.weights = None     # Poids des scores et décisions en cache, en tuple trié
+
+    def bind(self, weights):
+        # Appelé avant chaque recherche avec ses poids : si ce ne sont pas ceux des entrées en
+        # cache, les scores et décisions sont oubliés (les coups possibles restent valables)
+        key = tuple(sorted(weights.items()))
+        if key != self.weights:
+            self.scores.clear()
+            self.decisions.clear()
+            self.weights = key
+
+    def clear(self):
+        self.moves.clear()
+        self.scores.clear()
+        self.decisions.clear()
+
+    def caches(self):
+        # (nom, LRUCache) de chaque cache, pour les mesures
+        return [("moves", self.moves), ("scores", self.scores), ("decisions", self.decisions)]
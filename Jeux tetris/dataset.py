@@ -0,0 +1,151 @@
+# Exemples d'apprentissage tirés des parties de l'IA : pour chaque pièce posée, la grille avant le
+# placement, la pièce courante et la suivante, le placement choisi et le score de la partie.
+# De quoi entraîner une évaluation apprise à la place des poids écrits à la main (search.WEIGHTS).
+#
+#     python tetris_engine.py --games 100 --dataset donnees/     # enregistre les parties de l'IA
+#     python dataset.py donnees/                                 # résumé du jeu de données
+#
+# Les exemples sont écrits dans des fichiers .npy de SHARD_SIZE exemples (le dernier peut être
+# plus court), numérotés dans l'ordre d'écriture. Un fichier n'est jamais modifié une fois écrit :
+# un nouvel enregistrement dans le même dossier ajoute des fichiers à la suite.
+# Les fichiers sont ouverts en lecture seule avec np.load(..., mmap_mode="r") : seules les pages
+# lues sont chargées en mémoire, quelle que soit la taille du jeu de données.
+#
+# Format d'un exemple (SAMPLE) :
+#   board     : les GRID_HEIGHT lignes de la grille en masques de 16 bits (voir bitboard.py),
+#               le bit x de la ligne y vaut 1 si la case (x, y) est occupée
+#   current   : type de la pièce courante (indice dans replay.PIECE_TYPES)
+#   next      : type de la pièce suivante
+#   placement : placement joué, sur 16 bits comme dans les replays (voir replay.encode)
+#   score     : score de la partie avant le placement
+
+import argparse
+import glob
+import os
+import queue
+import sys
+import threading
+
+import numpy as np
+
+from bitboard import GRID_HEIGHT
+from replay import TYPE_INDEX, encode
+
+SHARD_SIZE = 1 << 16    # Exemples par fichier (3 Mo)
+
+SAMPLE = np.dtype([
+    ("board", "<u2", (GRID_HEIGHT,)),
+    ("current", "u1"),
+    ("next", "u1"),
+    ("placement", "<u2"),
+    ("score", "<u4"),
+])
+
+
+def shard_paths(directory):
+    return sorted(glob.glob(os.path.join(directory, "shard_*.npy")))
+
+
+class DatasetWriter:
+    # Enregistre les exemples dans `directory`. TetrisGame l'appelle à chaque pièce posée quand il
+    # est dans game.dataset. Les exemples sont copiés dans un tableau de SHARD_SIZE exemples ;
+    # quand il est plein, il est écrit sur le disque par un fil d'exécution séparé, et la partie
+    # continue aussitôt dans un nouveau tableau. close() écrit les derniers exemples.
+
+    def __init__(self, directory, shard_size=SHARD_SIZE):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.shard_size = shard_size
+        self.next_shard = len(shard_paths(directory))
+        self.samples = 0
+        self._buffer = np.zeros(shard_size, dtype=SAMPLE)
+        self._size = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._write_shards, daemon=True)
+        self._thread.start()
+
+    def record(self, game, piece, x, y):
+        # Appelé par TetrisGame.place avant que la pièce `piece` (voir pieces.piece_id) soit posée
+        sample = self._buffer[self._size]
+        sample["board"] = game.board
+        sample["current"] = TYPE_INDEX[game.current_type]
+        sample["next"] = TYPE_INDEX[game.next_type]
+        sample["placement"] = encode(piece, x, y)
+        sample["score"] = game.score
+        self._size += 1
+        self.samples += 1
+        if self._size == self.shard_size:
+            self.flush()
+
+    def flush(self):
+        # Envoie les exemples en attente au fil d'écriture, dans un fichier à eux
+        if not self._size:
+            return
+        self._queue.put((self.next_shard, self._buffer[:self._size]))
+        self.next_shard += 1
+        self._buffer = np.zeros(self.shard_size, dtype=SAMPLE)
+        self._size = 0
+
+    def close(self):
+        # Écrit les derniers exemples et attend la fin des écritures
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+
+    def _write_shards(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            n, samples = item
+            path = os.path.join(self.directory, f"shard_{n:06d}.npy")
+            # Écrit sous un autre nom puis renomme : un lecteur ne voit jamais de fichier incomplet
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, samples)
+            os.replace(path + ".tmp", path)
+
+
+#_______________Lecture______________________
+
+def open_shards(directory):
+    # Fichiers du jeu de données ouverts en lecture seule, sans les charger en mémoire
+    return [np.load(path, mmap_mode="r") for path in shard_paths(directory)]
+
+
+def iter_batches(directory, batch_size=4096):
+    # Parcourt les exemples par lots de `batch_size`, fichier après fichier (le dernier lot de
+    # chaque fichier peut être plus court). Les lots sont des vues sur les fichiers : seuls les
+    # exemples parcourus sont lus sur le disque. Les fichiers ajoutés pendant le parcours sont lus aussi.
+    n = 0
+    while True:
+        paths = shard_paths(directory)
+        if n >= len(paths):
+            return
+        shard = np.load(paths[n], mmap_mode="r")
+        for start in range(0, len(shard), batch_size):
+            yield shard[start:start + batch_size]
+        n += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Résumé d'un jeu de données enregistré par les parties de l'IA")
+    parser.add_argument("directory")
+    args = parser.parse_args()
+
+    paths = shard_paths(args.directory)
+    if not paths:
+        print(f"{args.directory} : aucun fichier d'exemples")
+        return 1
+    samples = 0
+    pieces = np.zeros(len(TYPE_INDEX), dtype=np.int64)
+    for batch in iter_batches(args.directory, SHARD_SIZE):
+        samples += len(batch)
+        pieces += np.bincount(batch["current"], minlength=len(TYPE_INDEX))
+    size = sum(os.path.getsize(path) for path in paths)
+    print(f"{args.directory} : {len(paths)} fichiers, {samples} exemples, {size / 1e6:.1f} Mo")
+    print("pièces : " + ", ".join(f"{key} {count}" for key, count in zip(TYPE_INDEX, pieces)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
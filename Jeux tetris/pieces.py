@@ -0,0 +1,60 @@
+# Les pièces du Tetris et leurs orientations, sans dépendance à pygame :
+# ce module peut être importé par les processus de calcul de l'IA.
+
+import bitboard
+
+SHAPE_COLORS = {
+    "line": (0, 255, 255),    # Cyan
+    "square": (255, 0, 0),    # Red
+    "t": (0, 255, 0),         # Green
+    "l": (0, 0, 255),         # Blue
+    "l_inv": (255, 255, 0),   # Yellow
+    "s": (255, 165, 0),       # Orange
+    "z": (128, 0, 128)        # Purple
+}
+
+SHAPES = {
+    "line": [[1, 1, 1, 1]],
+    "square": [[1, 1], [1, 1]],
+    "t": [[0, 1, 0], [1, 1, 1]],
+    "l": [[1, 0, 0], [1, 1, 1]],
+    "l_inv": [[0, 0, 1], [1, 1, 1]],
+    "s": [[0, 1, 1], [1, 1, 0]],
+    "z": [[1, 1, 0], [0, 1, 1]]
+}
+
+
+def rotate(shape):
+    return [ [ shape[y][x]
+            for y in range(len(shape)) ]
+            for x in range(len(shape[0]) - 1, -1, -1) ]
+
+
+# Orientations distinctes de chaque pièce, calculées une seule fois au chargement
+# (le carré n'en a qu'une, la ligne, le s et le z deux)
+ORIENTATIONS = {key: bitboard.unique_orientations(shape, rotate) for key, shape in SHAPES.items()}
+ORIENTATION_INDEX = {bitboard.shape_key(o.shape): (key, i)
+                     for key, orientations in ORIENTATIONS.items()
+                     for i, o in enumerate(orientations)}
+
+
+def piece_id(shape):
+    # Identifiant compact d'une orientation : (type de pièce, indice de l'orientation)
+    return ORIENTATION_INDEX[bitboard.shape_key(shape)]
+
+
+def orientations_from(piece):
+    # Orientations distinctes de la pièce `piece` (voir piece_id), en commençant par elle-même
+    key, i = piece
+    orientations = ORIENTATIONS[key]
+    return orientations[i:] + orientations[:i]
+
+
+def get_orientations(shape):
+    return orientations_from(piece_id(shape))
+
+
+def next_rotation(shape):
+    # Équivalent à rotate(shape), sans recalculer la matrice
+    orientations = get_orientations(shape)
+    return orientations[1 % len(orientations)].shape
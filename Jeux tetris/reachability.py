@@ -0,0 +1,179 @@
+# Coups atteignables par les commandes du jeu : décalage à gauche ou à droite, rotation
+# (orientation suivante, même coin haut gauche) et descente d'une ligne.
+# search.get_placements ne considère que les pièces lâchées tout droit depuis le haut ;
+# ici, les états (orientation, x, y) sont parcourus depuis la position d'apparition de la
+# pièce, ce qui trouve aussi les pièces glissées sous un surplomb ou tournées au dernier moment.
+#
+# Pour chaque orientation, les positions où la pièce tient sont calculées ligne par ligne sous
+# forme de masques (bit x : la pièce tient en colonne x), comme les lignes de la grille
+# (voir bitboard.py). Les positions déjà atteintes sont gardées de la même façon : un masque
+# par ligne et par orientation pour reachable_placements, un entier par orientation
+# (bit y * GRID_WIDTH + x) pour la recherche en largeur de reachable_moves.
+
+from collections import deque
+
+from bitboard import GRID_WIDTH, GRID_HEIGHT, BITS
+
+SPAWN_X = GRID_WIDTH // 2 - 1    # Colonne d'apparition des pièces (voir tetris_engine.py)
+
+# Commandes des chemins retournés par reachable_moves
+ROTATE = "rotate"
+LEFT = "left"
+RIGHT = "right"
+DOWN = "down"
+
+# Cases de chaque orientation, groupées par ligne : (ligne, colonnes), par masques de l'orientation
+_cells = {}
+
+
+def fitting_rows(board, orientation):
+    # Pour chaque ligne y où l'orientation peut se trouver, masque des colonnes x où elle ne
+    # chevauche ni la grille ni les bords
+    cells = _cells.get(orientation.masks)
+    if cells is None:
+        cells = [(r, BITS[mask]) for r, mask in enumerate(orientation.masks)]
+        _cells[orientation.masks] = cells
+    valid = (1 << (GRID_WIDTH - orientation.width + 1)) - 1
+    rows = []
+    for y in range(GRID_HEIGHT - orientation.height + 1):
+        blocked = 0
+        for r, columns in cells:
+            row = board[y + r]
+            if row:
+                for c in columns:
+                    blocked |= row >> c
+        rows.append(valid & ~blocked)
+    return rows
+
+
+def _spread(seeds, free):
+    # Positions de la ligne atteintes par décalages successifs depuis `seeds`
+    while True:
+        spread = (seeds | seeds << 1 | seeds >> 1) & free
+        if spread == seeds:
+            return seeds
+        seeds = spread
+
+
+def reachable_placements(board, orientations, start=None, heights=None):
+    # Toutes les positions de repos atteignables, chacune une fois : liste de (orientation, x, y)
+    # classée par orientation, puis x, puis y. `orientations` commence par l'orientation de la
+    # pièce à son départ `start` (x, y), par défaut en haut de la grille en colonne SPAWN_X.
+    # Les pièces lâchées tout droit (search.get_placements) en font partie quand le haut de la
+    # grille est libre : ce sont les premières de chaque colonne.
+    # `heights` sont les hauteurs des colonnes de la grille si l'appelant les connait déjà.
+    n = len(orientations)
+    free = [fitting_rows(board, orientation) for orientation in orientations]
+    reach = [[0] * len(rows) for rows in free]
+
+    if start is None:
+        top = GRID_HEIGHT - (max(heights) if heights is not None else _stack_height(board))
+        if top >= 4:
+            # Les 4 lignes au-dessus de la pile sont libres : toute orientation et toute colonne
+            # y est atteignable depuis le départ, la recherche commence là
+            first = top - 4
+            for k in range(n):
+                reach[k][first] = free[k][first]
+        else:
+            first = 0
+            if free[0] and free[0][0] >> SPAWN_X & 1:
+                reach[0][0] = 1 << SPAWN_X
+    else:
+        x, first = start
+        if first < len(free[0]) and free[0][first] >> x & 1:
+            reach[0][first] = 1 << x
+
+    placements = []
+    for y in range(first, GRID_HEIGHT):
+        # Décalages et rotations sur la ligne, jusqu'à ce que plus rien ne change
+        changed = True
+        while changed:
+            changed = False
+            for k in range(n):
+                if y >= len(free[k]) or not reach[k][y]:
+                    continue
+                reached = reach[k][y] = _spread(reach[k][y], free[k][y])
+                following = (k + 1) % n
+                if y < len(free[following]):
+                    rotated = reached & free[following][y]
+                    if rotated & ~reach[following][y]:
+                        reach[following][y] |= rotated
+                        changed = True
+
+        # Descente : les positions qui ne peuvent pas descendre sont des positions de repos
+        for k in range(n):
+            if y >= len(free[k]) or not reach[k][y]:
+                continue
+            below = free[k][y + 1] if y + 1 < len(free[k]) else 0
+            if below:
+                reach[k][y + 1] |= reach[k][y] & below
+            for x in BITS[reach[k][y] & ~below]:
+                placements.append((k, x, y))
+
+    placements.sort()
+    return [(orientations[k], x, y) for k, x, y in placements]
+
+
+def _stack_height(board):
+    for y, row in enumerate(board):
+        if row:
+            return GRID_HEIGHT - y
+    return 0
+
+
+def reachable_moves(board, orientations, start=None):
+    # Recherche en largeur sur les états (orientation, x, y) depuis `start` (voir
+    # reachable_placements). Retourne un dictionnaire {(indice de l'orientation, x, y): chemin}
+    # des positions de repos atteignables, le chemin étant la liste des commandes (ROTATE,
+    # LEFT, RIGHT, DOWN) qui y mènent, parmi les plus courtes, rotations et décalages d'abord.
+    n = len(orientations)
+    free = [fitting_rows(board, orientation) for orientation in orientations]
+    x, y = (SPAWN_X, 0) if start is None else start
+    if y >= len(free[0]) or not free[0][y] >> x & 1:
+        return {}
+
+    def fits(k, x, y):
+        return 0 <= x and y < len(free[k]) and free[k][y] >> x & 1
+
+    visited = [0] * n
+    visited[0] = 1 << (y * GRID_WIDTH + x)
+    parents = {(0, x, y): None}
+    queue = deque([(0, x, y)])
+    resting = []
+    while queue:
+        state = queue.popleft()
+        k, x, y = state
+        for move, following in ((ROTATE, ((k + 1) % n, x, y)), (LEFT, (k, x - 1, y)),
+                                (RIGHT, (k, x + 1, y)), (DOWN, (k, x, y + 1))):
+            fk, fx, fy = following
+            if not fits(fk, fx, fy):
+                continue
+            bit = 1 << (fy * GRID_WIDTH + fx)
+            if visited[fk] & bit:
+                continue
+            visited[fk] |= bit
+            parents[following] = (state, move)
+            queue.append(following)
+        if not fits(k, x, y + 1):
+            resting.append(state)
+
+    moves = {}
+    for state in resting:
+        path = []
+        current = state
+        while parents[current] is not None:
+            current, move = parents[current]
+            path.append(move)
+        path.reverse()
+        moves[state] = path
+    return moves
+
+
+def find_path(board, orientations, start, target):
+    # Commandes qui amènent la pièce de `start` (x, y), dans l'orientation orientations[0],
+    # au placement `target` (orientation, x, y), None s'il n'est pas atteignable
+    orientation, x, y = target
+    for k, candidate in enumerate(orientations):
+        if candidate.masks == orientation.masks:
+            return reachable_moves(board, orientations, start).get((k, x, y))
+    return None
@@ -0,0 +1,299 @@
+# Enregistrement et relecture des parties de Tetris.
+# Une partie est entièrement déterminée par la graine de ses pièces et les placements joués :
+# un fichier de replay ne contient que la graine, 2 octets par pièce posée et, toutes les
+# SNAPSHOT_INTERVAL pièces, un instantané de la grille pour ne pas tout rejouer depuis le début
+# quand on cherche l'état après la pièce N.
+#
+#     python replay.py replays/partie.trp                 # résumé et vérification
+#     python replay.py replays/partie.trp --board 150     # grille après 150 pièces
+#     python replay.py replays/*.trp --diverge            # première pièce où l'IA actuelle joue autrement
+#
+# Format (petit-boutiste) :
+#   en-tête   : "TRPL", version (B), graine (Q), pièces (I), intervalle des instantanés (H),
+#               instantanés (I), pièce courante et suivante à la fin de la partie (B, B),
+#               options de recherche de l'IA qui a joué (B : bit 0 partie de l'IA, bit 1 tucks ;
+#               puis profondeur (B) et largeur du faisceau (B), voir search.best_placement)
+#   placements: un entier de 16 bits par pièce : type (3 bits), orientation (2), x (4), y (5)
+#   instantanés: score (I), lignes (I), puis les 200 cases de la grille sur 4 bits chacune
+#               (0 : vide, sinon 1 + indice du type de la pièce)
+
+import argparse
+import os
+import struct
+import sys
+
+import bitboard
+import search
+from bitboard import GRID_WIDTH, GRID_HEIGHT
+from pieces import SHAPES, SHAPE_COLORS, ORIENTATIONS, piece_id
+from tetris_engine import TetrisGame
+
+MAGIC = b"TRPL"
+VERSION = 2
+SNAPSHOT_INTERVAL = 100     # Pièces entre deux instantanés de la grille
+
+# Dossier où les jeux enregistrent leurs parties
+REPLAY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replays")
+
+HEADER = struct.Struct("<4sBQIHIBBBBB")
+HEADER_V1 = struct.Struct("<4sBQIHIBB")     # Sans les options de recherche
+AI_GAME = 1
+TUCKS = 2
+SNAPSHOT = struct.Struct(f"<II{GRID_WIDTH * GRID_HEIGHT // 2}s")
+
+PIECE_TYPES = list(SHAPES)
+TYPE_INDEX = {key: i for i, key in enumerate(PIECE_TYPES)}
+COLOR_CODES = {SHAPE_COLORS[key]: i + 1 for i, key in enumerate(PIECE_TYPES)}
+CODE_COLORS = [None] + [SHAPE_COLORS[key] for key in PIECE_TYPES]
+
+
+def encode(piece, x, y):
+    # Placement de la pièce `piece` (voir pieces.piece_id) en (x, y) sur 16 bits
+    key, orientation = piece
+    return TYPE_INDEX[key] << 11 | orientation << 9 | x << 5 | y
+
+
+def decode(code):
+    # Retourne (type de pièce, indice de l'orientation, x, y)
+    return PIECE_TYPES[code >> 11], code >> 9 & 3, code >> 5 & 15, code & 31
+
+
+#_______________Instantanés______________________
+
+def take_snapshot(game):
+    cells = [COLOR_CODES[color] if color else 0 for row in game.colors for color in row]
+    packed = bytes(cells[i] << 4 | cells[i + 1] for i in range(0, len(cells), 2))
+    return game.score, game.lines, packed
+
+
+def restore_snapshot(snapshot):
+    # Retourne (grille bitboard, couleurs, score, lignes)
+    score, lines, packed = snapshot
+    cells = []
+    for byte in packed:
+        cells.append(CODE_COLORS[byte >> 4])
+        cells.append(CODE_COLORS[byte & 15])
+    colors = [cells[y * GRID_WIDTH:(y + 1) * GRID_WIDTH] for y in range(GRID_HEIGHT)]
+    return bitboard.from_grid(colors), colors, score, lines
+
+
+#_______________Relecture______________________
+
+class ReplayGame(TetrisGame):
+    # Partie rejouée : les pièces viennent de l'enregistrement, pas du générateur aléatoire,
+    # ce qui permet de repartir d'un instantané sans connaître l'état du générateur
+
+    def __init__(self, replay, start=0, snapshot=None):
+        self.seed = replay.seed
+        self.recorder = None
+        self.dataset = None
+        self.types = replay.types
+        if snapshot is None:
+            self.board = bitboard.EMPTY_BOARD
+            self.colors = [[None for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+            self.score = 0
+            self.lines = 0
+        else:
+            self.board, self.colors, self.score, self.lines = restore_snapshot(snapshot)
+        self.pieces = start
+        self.game_over = False
+        self._drawn = start
+        self.next_type = self._draw_type()
+        self._spawn()
+
+    def _draw_type(self):
+        key = self.types[self._drawn]
+        self._drawn += 1
+        return key
+
+
+class Replay:
+    # Une partie enregistrée : graine, placements (codes de 16 bits, voir encode), pièce courante
+    # et suivante à la fin de la partie, et instantanés après SNAPSHOT_INTERVAL, 2 * SNAPSHOT_INTERVAL, ... pièces.
+    # `options` sont les options de search.best_placement de l'IA qui a joué (tucks, depth,
+    # beam_width), None pour une partie jouée par un joueur ou enregistrée sans elles.
+
+    def __init__(self, seed, codes, final_types, snapshots, interval=SNAPSHOT_INTERVAL, options=None):
+        self.seed = seed
+        self.codes = codes
+        self.snapshots = snapshots
+        self.interval = interval
+        self.options = options
+        # Suite des pièces de la partie : celles posées puis les deux dernières tirées
+        self.types = [PIECE_TYPES[code >> 11] for code in codes] + list(final_types)
+
+    @classmethod
+    def build(cls, seed, codes, interval=SNAPSHOT_INTERVAL, options=None):
+        # Rejoue les placements à partir de la graine pour vérifier les pièces et créer les instantanés
+        game = TetrisGame(seed)
+        snapshots = []
+        for n, code in enumerate(codes):
+            key, orientation, x, y = decode(code)
+            if key != game.current_type:
+                raise ValueError(f"pièce {n} : '{key}' enregistrée, '{game.current_type}' tirée avec la graine {seed}")
+            game.place(ORIENTATIONS[key][orientation].shape, x, y)
+            if (n + 1) % interval == 0:
+                snapshots.append(take_snapshot(game))
+        return cls(seed, list(codes), (game.current_type, game.next_type), snapshots, interval, options)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def placement(self, n):
+        # Placement (orientation, x, y) de la pièce n, comme ceux de search.best_placement
+        key, orientation, x, y = decode(self.codes[n])
+        return ORIENTATIONS[key][orientation], x, y
+
+    def game_at(self, n):
+        # État de la partie après n pièces posées, en repartant du dernier instantané avant n
+        if not 0 <= n <= len(self.codes):
+            raise IndexError(f"pièce {n} hors de la partie ({len(self.codes)} pièces)")
+        k = min(n // self.interval, len(self.snapshots))
+        if k:
+            game = ReplayGame(self, k * self.interval, self.snapshots[k - 1])
+        else:
+            game = ReplayGame(self)
+        for i in range(k * self.interval, n):
+            orientation, x, y = self.placement(i)
+            game.place(orientation.shape, x, y)
+        return game
+
+    def games(self, start=0):
+        # Parcourt la partie pièce par pièce depuis la pièce `start` : retourne le même objet
+        # ReplayGame, juste avant chaque placement puis à la fin de la partie
+        game = self.game_at(start)
+        for n in range(start, len(self.codes)):
+            yield game
+            orientation, x, y = self.placement(n)
+            game.place(orientation.shape, x, y)
+        yield game
+
+    def to_bytes(self):
+        flags, depth, beam_width = 0, 0, 0
+        if self.options is not None:
+            flags = AI_GAME | (TUCKS if self.options["tucks"] else 0)
+            depth, beam_width = self.options["depth"], self.options["beam_width"]
+        header = HEADER.pack(MAGIC, VERSION, self.seed, len(self.codes), self.interval, len(self.snapshots),
+                             TYPE_INDEX[self.types[-2]], TYPE_INDEX[self.types[-1]], flags, depth, beam_width)
+        placements = struct.pack(f"<{len(self.codes)}H", *self.codes)
+        return header + placements + b"".join(SNAPSHOT.pack(*snapshot) for snapshot in self.snapshots)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version = struct.unpack_from("<4sB", data)
+        if magic != MAGIC or version not in (1, VERSION):
+            raise ValueError("pas un replay de Tetris (ou version inconnue)")
+        options = None
+        if version == 1:
+            _, _, seed, count, interval, snapshot_count, current, following = HEADER_V1.unpack_from(data)
+            offset = HEADER_V1.size
+        else:
+            (_, _, seed, count, interval, snapshot_count, current, following,
+             flags, depth, beam_width) = HEADER.unpack_from(data)
+            offset = HEADER.size
+            if flags & AI_GAME:
+                options = {"tucks": bool(flags & TUCKS), "depth": depth, "beam_width": beam_width}
+        codes = list(struct.unpack_from(f"<{count}H", data, offset))
+        offset += 2 * count
+        snapshots = [SNAPSHOT.unpack_from(data, offset + i * SNAPSHOT.size) for i in range(snapshot_count)]
+        return cls(seed, codes, (PIECE_TYPES[current], PIECE_TYPES[following]), snapshots, interval, options)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+class ReplayRecorder:
+    # Enregistre les placements d'une partie créée avec la graine `seed`.
+    # TetrisGame l'appelle à chaque pièce posée quand il est dans game.recorder.
+    # Pour une partie de l'IA, `options` sont ses options de recherche (voir Replay).
+
+    def __init__(self, seed, options=None):
+        self.seed = seed
+        self.options = options
+        self.codes = []
+
+    def record(self, piece, x, y):
+        self.codes.append(encode(piece, x, y))
+
+    def replay(self, interval=SNAPSHOT_INTERVAL):
+        return Replay.build(self.seed, self.codes, interval, self.options)
+
+    def save(self, directory, name=None):
+        # Écrit le replay dans `directory` (nom par défaut : graine et nombre de pièces), retourne son chemin
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name or f"{self.seed}_{len(self.codes)}.trp")
+        self.replay().save(path)
+        return path
+
+
+def first_divergence(replay, **options):
+    # Première pièce où l'IA (options : voir search.best_placement) ne joue pas le placement
+    # enregistré : retourne (n, placement enregistré, placement de l'IA), None si elle joue tout pareil
+    for n, game in enumerate(replay.games()):
+        if n == len(replay):
+            return None
+        recorded = replay.placement(n)
+        placement = game.ai_placement(**options)
+        if placement is None or placement[0].shape != recorded[0].shape or placement[1:] != recorded[1:]:
+            return n, recorded, placement
+
+
+#_______________Ligne de commande______________________
+
+def print_board(game):
+    for y in range(GRID_HEIGHT):
+        print("".join("#" if game.board[y] >> x & 1 else "." for x in range(GRID_WIDTH)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relecture des parties de Tetris enregistrées")
+    parser.add_argument("replays", nargs="+", help="fichiers .trp")
+    parser.add_argument("--board", type=int, help="afficher la grille après ce nombre de pièces")
+    parser.add_argument("--diverge", action="store_true",
+                        help="chercher la première pièce où l'IA actuelle joue autrement")
+    parser.add_argument("--weights", default=search.WEIGHTS_FILE, help="poids de l'IA pour --diverge")
+    # Sans ces options, --diverge reprend celles enregistrées avec la partie
+    parser.add_argument("--depth", type=int)
+    parser.add_argument("--beam", type=int)
+    parser.add_argument("--tucks", action=argparse.BooleanOptionalAction,
+                        help="coups glissés sous les surplombs (voir reachability.py)")
+    args = parser.parse_args()
+
+    weights = search.load_weights(args.weights)
+    diverged = 0
+    for path in args.replays:
+        replay = Replay.load(path)
+        Replay.build(replay.seed, replay.codes, replay.interval)   # Vérifie les pièces tirées avec la graine
+        final = replay.game_at(len(replay))
+        print(f"{path} : graine {replay.seed}, {len(replay)} pièces, {final.lines} lignes, score {final.score}"
+              + (f", IA {replay.options}" if replay.options is not None else ""))
+        if args.board is not None:
+            print_board(replay.game_at(args.board))
+        if args.diverge:
+            options = dict(replay.options or {"tucks": False, "depth": 3, "beam_width": 0})
+            if args.depth is not None:
+                options["depth"] = args.depth
+            if args.beam is not None:
+                options["beam_width"] = args.beam
+            if args.tucks is not None:
+                options["tucks"] = args.tucks
+            result = first_divergence(replay, weights=weights, **options)
+            if result is not None:
+                n, recorded, placement = result
+                diverged += 1
+                print(f"  diverge à la pièce {n} : enregistré {piece_id(recorded[0].shape)} {recorded[1:]}, "
+                      f"IA {piece_id(placement[0].shape) if placement else None} {placement[1:] if placement else ''}")
+    if args.diverge:
+        print(f"{diverged}/{len(args.replays)} parties divergent")
+        return 1 if diverged else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,426 @@
+# Recherche du meilleur coup de l'IA sur une grille bitboard (voir bitboard.py).
+# Ce module n'importe pas pygame : il sert aussi dans les processus de calcul parallèle.
+
+import atexit
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import bitboard
+import cache
+import reachability
+from bitboard import GRID_WIDTH
+from pieces import ORIENTATIONS, orientations_from
+
+'''
+max_height : Pénalise les colonnes trop hautes. Poids = ?.
+holes : Les trous sont très pénalisants car ils rendent le nettoyage des lignes difficile. Poids = ?.
+height_disparity : Pénalise les grandes différences de hauteur entre colonnes adjacentes. Poids = ?.
+total_height : Pénalise les hauteurs globales élevées. Poids = ?.
+lines_cleared : Favorise énormément la formation de ligne complète car elles permettent de les faire disparaitre . Poids = ?.
+'''
+
+#Critères
+WEIGHTS = {
+    'max_height': -0.5,
+    'holes': -1.0,
+    'height_disparity': -0.2,
+    'total_height': -0.3,
+    'lines_cleared': 1.0
+}
+
+# Poids réglés par tune_weights.py, chargés au démarrage du jeu s'ils existent
+WEIGHTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'weights.json')
+
+
+def load_weights(path=WEIGHTS_FILE):
+    # Poids par défaut, remplacés par ceux du fichier `path` s'il existe
+    weights = dict(WEIGHTS)
+    if os.path.exists(path):
+        with open(path) as f:
+            saved = json.load(f)
+        weights.update({key: float(value) for key, value in saved.items() if key in WEIGHTS})
+    return weights
+
+
+def save_weights(weights, path=WEIGHTS_FILE):
+    with open(path, 'w') as f:
+        json.dump(weights, f, indent=4)
+
+
+def get_placements(grid, orientations, heights=None, tucks=False):
+    # Toutes les positions où la pièce peut être lâchée, pour chacune de ses orientations
+    # distinctes (voir bitboard.Orientation) : liste de (orientation, x, y) en cases.
+    # `heights` sont les hauteurs des colonnes de la grille si l'appelant les connait déjà.
+    # tucks : toutes les positions atteignables par décalages, rotations et descentes depuis
+    # le haut de la grille (voir reachability.py), y compris sous les surplombs
+    if tucks:
+        return reachability.reachable_placements(grid, orientations, heights=heights)
+    placements = []
+    if heights is None:
+        heights = bitboard.column_heights(grid)
+
+    # Parcourir chaque orientation distincte et chaque position possible où la pièce pourrait être placée
+    for orientation in orientations:
+        for x in range(GRID_WIDTH - orientation.width + 1):
+            y = bitboard.drop_position(grid, orientation, x, heights)
+            # Vérifier si la pièce peut être placée à cette position
+            if y >= 0:
+                placements.append((orientation, x, y))
+
+    return placements
+
+
+def get_cached_placements(grid, orientations, heights, search_cache, tucks=False):
+    # get_placements mémorisé par (grille, pièce) quand un cache est fourni
+    if search_cache is None:
+        return get_placements(grid, orientations, heights, tucks)
+    key = (tuple(grid), orientations[0].masks, tucks)
+    placements = search_cache.moves.get(key)
+    if placements is None:
+        placements = get_placements(grid, orientations, heights, tucks)
+        search_cache.moves.put(key, placements)
+    return placements
+
+
+def best_placement(board, piece, next_piece, weights=WEIGHTS, batch=False, search_cache=None, workers=0,
+                   depth=2, beam_width=0, stats=None, tucks=False):
+    # Meilleur placement (orientation, x, y) de `piece` en tenant compte de `next_piece`
+    # (pièces données par pieces.piece_id), ou None si la pièce ne rentre nulle part.
+    # - batch : les grilles feuilles sont notées en un seul lot par NumPy (voir batch_eval.py)
+    # - search_cache : cache.SearchCache des décisions, coups et scores déjà calculés
+    # - workers : nombre de processus entre lesquels répartir les premiers coups (0 : aucun)
+    # Le résultat est le même quel que soit le mode choisi.
+    # - beam_width : si non nul, recherche en faisceau sur `depth` pièces (voir beam_placement),
+    #   les options précédentes sont alors ignorées
+    # - stats : comme pour beam_placement
+    # - tucks : coups glissés sous les surplombs compris (voir get_placements), sauf en faisceau
+    if beam_width:
+        return beam_placement(board, piece, next_piece, weights, depth, beam_width, stats)
+    if stats is not None:
+        for key in ('decisions', 'expanded', 'generated'):
+            stats.setdefault(key, 0)
+        stats['decisions'] += 1
+    if search_cache is not None:
+        found, placement = cached_decision(search_cache, board, piece, next_piece, weights, tucks)
+        if not found:
+            placement = _search(board, piece, next_piece, weights, batch, search_cache, workers, stats, tucks)
+            store_decision(search_cache, board, piece, next_piece, weights, placement, tucks)
+        return placement
+    return _search(board, piece, next_piece, weights, batch, None, workers, stats, tucks)
+
+
+def cached_decision(search_cache, board, piece, next_piece, weights, tucks=False):
+    # (True, placement) si best_placement a déjà donné `placement` pour cette position avec ces
+    # poids (placement None compris : la pièce ne rentre nulle part), (False, None) sinon
+    search_cache.bind(weights)
+    placement = search_cache.decisions.get((board, piece, next_piece, tucks), cache.MISSING)
+    if placement is cache.MISSING:
+        return False, None
+    return True, placement
+
+
+def store_decision(search_cache, board, piece, next_piece, weights, placement, tucks=False):
+    # Mémorise `placement`, résultat de best_placement pour cette position avec ces poids
+    search_cache.bind(weights)
+    search_cache.decisions.put((board, piece, next_piece, tucks), placement)
+
+
+def _search(board, piece, next_piece, weights, batch, search_cache, workers, stats=None, tucks=False):
+    if workers > 0:
+        return _search_parallel(board, piece, next_piece, weights, workers, tucks, stats)
+    if batch:
+        return _search_batch(board, orientations_from(piece), orientations_from(next_piece), weights,
+                             search_cache, stats, tucks)
+    return _search_scalar(board, orientations_from(piece), orientations_from(next_piece), weights,
+                          search_cache, stats, tucks)
+
+
+def _search_scalar(board, orientations, next_orientations, weights, search_cache, stats=None, tucks=False):
+    best_placement = None
+    best_score = float('-inf')
+
+    # Les coups sont joués puis annulés sur une seule grille dont les critères
+    # sont tenus à jour à chaque placement (voir bitboard.BoardState).
+    # Le score d'une feuille se calcule en temps constant : il n'est pas mis en cache.
+    state = bitboard.BoardState(board)
+    placements = get_cached_placements(board, orientations, state.heights, search_cache, tucks)
+    for placement in placements:
+        state.place(*placement)
+
+        next_placements = get_cached_placements(state.rows, next_orientations, state.heights, search_cache, tucks)
+        if stats is not None:
+            stats['generated'] += len(next_placements)
+        for next_placement in next_placements:
+            state.place(*next_placement)
+            # Calculer le score pour cette configuration
+            score = state.score(weights)
+            state.undo()
+
+            if score > best_score:
+                best_score = score
+                best_placement = placement
+
+        state.undo()
+
+    if stats is not None:
+        stats['expanded'] += 1 + len(placements)
+        stats['generated'] += len(placements)
+    return best_placement
+
+
+def _search_batch(board, orientations, next_orientations, weights, search_cache, stats=None, tucks=False):
+    # Toutes les grilles du second coup sont d'abord générées puis notées en un seul lot
+    import batch_eval   # NumPy n'est importé qu'au premier usage de ce mode
+    first_moves = []
+    leaves = []
+    leaf_parents = []   # Indice du premier coup dont vient chaque grille
+
+    grid_heights = bitboard.column_heights(board)
+    for orientation, x, y in get_cached_placements(board, orientations, grid_heights, search_cache, tucks):
+        temp_grid = bitboard.place(board, orientation.masks, x, y)
+        temp_heights = bitboard.place_heights(grid_heights, orientation, x, y)
+        parent = len(first_moves)
+        first_moves.append((orientation, x, y))
+
+        for next_orientation, next_x, next_y in get_cached_placements(temp_grid, next_orientations, temp_heights,
+                                                                      search_cache, tucks):
+            leaves.append(bitboard.place(temp_grid, next_orientation.masks, next_x, next_y))
+            leaf_parents.append(parent)
+
+    if stats is not None:
+        stats['expanded'] += 1 + len(first_moves)
+        stats['generated'] += len(first_moves) + len(leaves)
+    if not leaves:
+        return None
+    if search_cache is None:
+        best = batch_eval.best_board(leaves, weights)
+    else:
+        # Seules les grilles absentes du cache passent par NumPy
+        scores = [search_cache.scores.get(leaf) for leaf in leaves]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            new_scores = batch_eval.score_boards([leaves[i] for i in missing], weights).tolist()
+            for i, score in zip(missing, new_scores):
+                scores[i] = score
+                search_cache.scores.put(leaves[i], score)
+        best = max(range(len(scores)), key=scores.__getitem__)   # Le premier en cas d'égalité
+    return first_moves[leaf_parents[best]]
+
+
+def branch_scores(board, placements, next_orientations, weights, tucks=False, stats=None):
+    # Meilleur score atteignable après chacun des premiers coups `placements`
+    # (-inf si la pièce suivante ne rentre nulle part après ce coup).
+    # `stats` reçoit un nœud développé par premier coup et les grilles générées après lui.
+    return list(iter_branch_scores(board, placements, next_orientations, weights, tucks, stats))
+
+
+def iter_branch_scores(board, placements, next_orientations, weights, tucks=False, stats=None):
+    # Comme branch_scores, mais chaque score est produit dès qu'il est calculé
+    state = bitboard.BoardState(board)
+    for placement in placements:
+        state.place(*placement)
+        best_score = float('-inf')
+        next_placements = get_placements(state.rows, next_orientations, state.heights, tucks)
+        if stats is not None:
+            stats['expanded'] += 1
+            stats['generated'] += len(next_placements)
+        for next_placement in next_placements:
+            state.place(*next_placement)
+            score = state.score(weights)
+            state.undo()
+            if score > best_score:
+                best_score = score
+        state.undo()
+        yield best_score
+
+
+#_______________Calcul parallèle______________________
+
+# Les processus sont créés une seule fois et réutilisés d'une pièce à l'autre
+_pool = None
+_pool_workers = 0
+
+
+def get_pool(workers):
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        shutdown_pool()
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+def shutdown_pool():
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+        _pool_workers = 0
+
+
+atexit.register(shutdown_pool)
+
+
+def _branch_task(board, piece, next_piece, start, stop, weights, tucks=False):
+    # Exécuté dans un processus de calcul. Seuls la grille (20 entiers), les identifiants
+    # des pièces et un intervalle de premiers coups sont transmis : le processus
+    # recalcule lui-même la liste des coups, identique à celle du processus principal.
+    # Retourne les scores des coups et les nœuds développés et grilles générées pour eux.
+    placements = get_placements(board, orientations_from(piece), tucks=tucks)[start:stop]
+    stats = {'expanded': 0, 'generated': 0}
+    return branch_scores(board, placements, orientations_from(next_piece), weights, tucks, stats), stats
+
+
+def _search_parallel(board, piece, next_piece, weights, workers, tucks=False, stats=None):
+    placements = get_placements(board, orientations_from(piece), tucks=tucks)
+    if stats is not None:
+        stats['expanded'] += 1
+        stats['generated'] += len(placements)
+    if not placements:
+        return None
+
+    # Découpage en intervalles contigus, résultats rassemblés dans l'ordre des coups
+    chunks = min(len(placements), workers * 2)
+    bounds = [len(placements) * i // chunks for i in range(chunks + 1)]
+    pool = get_pool(workers)
+    futures = [pool.submit(_branch_task, board, piece, next_piece, bounds[i], bounds[i + 1], weights, tucks)
+               for i in range(chunks)]
+    scores = []
+    for future in futures:
+        chunk_scores, chunk_stats = future.result()
+        scores.extend(chunk_scores)
+        if stats is not None:
+            stats['expanded'] += chunk_stats['expanded']
+            stats['generated'] += chunk_stats['generated']
+
+    # Premier coup atteignant le meilleur score, comme dans la recherche séquentielle
+    best = max(range(len(scores)), key=scores.__getitem__)
+    if scores[best] == float('-inf'):
+        return None
+    return placements[best]
+
+
+#_______________Recherche en faisceau______________________
+
+# Valeur d'une pièce qui ne rentre plus nulle part (fin de partie), pire que toute grille jouable
+GAME_OVER_SCORE = -1e6
+
+# Toutes les pièces possibles, pour les coups qui suivent la pièce suivante (inconnus)
+ALL_PIECES = [(key, 0) for key in ORIENTATIONS]
+
+
+class BeamNode:
+    # Une grille de la recherche en faisceau, lignes pleines supprimées.
+    # `heuristic` est le score de la grille avant suppression des lignes, plus les lignes
+    # supprimées aux coups précédents. `groups` reste None tant que le nœud n'est pas développé,
+    # puis contient ses enfants : un seul groupe si la pièce suivante est connue,
+    # un groupe par pièce possible sinon. Au dernier coup, les enfants ne sont pas gardés :
+    # `groups` est vide et `heuristic` devient directement la valeur du nœud (voir evaluate).
+    __slots__ = ("board", "heuristic", "lines", "move", "groups")
+
+    def __init__(self, board, heuristic, lines, move):
+        self.board = board
+        self.heuristic = heuristic
+        self.lines = lines
+        self.move = move
+        self.groups = None
+
+    def value(self):
+        # Valeur remontée : meilleur enfant de chaque groupe, moyenne sur les groupes
+        # (espérance sur les 7 pièces quand la pièce n'est pas connue).
+        # Dans un groupe, seuls les enfants développés sont comparés entre eux : le score d'une
+        # grille moins profonde n'est pas comparable. Un groupe dont aucun enfant n'a été
+        # développé garde le score de son meilleur enfant.
+        if not self.groups:
+            return self.heuristic
+        total = 0.0
+        for group in self.groups:
+            if not group:
+                total += GAME_OVER_SCORE
+                continue
+            expanded = [child for child in group if child.groups is not None]
+            total += max(child.value() for child in expanded or group)
+        return total / len(self.groups)
+
+
+def expand(node, pieces, weights, stats):
+    # Développe `node` pour chacune des `pieces` et retourne tous ses enfants
+    state = bitboard.BoardState(node.board)
+    line_bonus = weights['lines_cleared'] * node.lines
+    node.groups = []
+    children = []
+    for piece in pieces:
+        group = []
+        for placement in get_placements(node.board, orientations_from(piece), state.heights):
+            state.place(*placement)
+            board, removed = bitboard.clear_lines(tuple(state.rows))
+            group.append(BeamNode(board, state.score(weights) + line_bonus, node.lines + removed, node.move or placement))
+            state.undo()
+        node.groups.append(group)
+        children.extend(group)
+    if stats is not None:
+        stats['expanded'] += 1
+        stats['generated'] += len(children)
+    return children
+
+
+def evaluate(nodes, pieces, weights, stats):
+    # Développe les `nodes` au dernier coup : la valeur de chacun est le meilleur score atteignable
+    # avec chacune des `pieces`, en moyenne sur les pièces, sans créer de nœuds enfants.
+    # C'est l'essentiel du coût de la recherche (7 pièces par nœud) : tous les coups de tous les
+    # nœuds sont joués et notés en un seul lot par NumPy (batch_eval.drop_scores), avec la
+    # même formule que BoardState.score.
+    if not nodes:
+        return
+    import batch_eval   # NumPy n'est importé qu'au premier usage de la recherche en faisceau
+    scores = batch_eval.drop_scores([node.board for node in nodes], [key for key, _ in pieces], weights)
+    for node, best_scores in zip(nodes, scores.max(axis=2).tolist()):
+        line_bonus = weights['lines_cleared'] * node.lines
+        total = 0.0
+        for score in best_scores:
+            total += score + line_bonus if score != float('-inf') else GAME_OVER_SCORE
+        node.groups = ()
+        node.heuristic = total / len(pieces)
+    if stats is not None:
+        stats['expanded'] += len(nodes)
+        stats['generated'] += int((scores > float('-inf')).sum())
+
+
+def beam_placement(board, piece, next_piece, weights=WEIGHTS, depth=3, beam_width=4, stats=None, deadline=None):
+    # Recherche sur `depth` pièces : la pièce courante, la suivante, puis des pièces inconnues
+    # dont on prend l'espérance sur les 7 possibles. À chaque coup, seules les `beam_width`
+    # grilles de meilleur score sont développées au coup suivant.
+    # Contrairement à best_placement, les lignes pleines sont supprimées entre deux coups.
+    # `stats` (dictionnaire) reçoit le nombre de décisions, de nœuds développés et de grilles générées.
+    # Si `deadline` (instant time.perf_counter) est dépassé, la recherche s'arrête et retourne None.
+    if stats is not None:
+        for key in ('decisions', 'expanded', 'generated'):
+            stats.setdefault(key, 0)
+        stats['decisions'] += 1
+
+    root = BeamNode(board, 0.0, 0, None)
+    beam = [root]
+    for ply in range(max(depth, 2) - 1):
+        pieces = [piece] if ply == 0 else [next_piece] if ply == 1 else ALL_PIECES
+        children = []
+        for node in beam:
+            if deadline is not None and time.perf_counter() > deadline:
+                return None
+            children.extend(expand(node, pieces, weights, stats))
+        # Tri stable : à score égal, l'ordre des coups est conservé
+        beam = sorted(children, key=lambda child: child.heuristic, reverse=True)[:beam_width]
+
+    if depth >= 2:
+        pieces = [next_piece] if depth == 2 else ALL_PIECES
+        if deadline is not None and time.perf_counter() > deadline:
+            return None
+        evaluate(beam, pieces, weights, stats)
+
+    moves = root.groups[0]
+    if not moves:
+        return None
+    # Premier coup de meilleure valeur, le premier en cas d'égalité
+    expanded = [child for child in moves if child.groups is not None]
+    return max(expanded or moves, key=BeamNode.value).move
@@ -0,0 +1,214 @@
+# Moteur de Tetris sans pygame : l'état d'une partie, ses règles, et une partie jouée par l'IA.
+# Tetris_IA.py n'est plus qu'un affichage pygame au-dessus de ce moteur, et les parties
+# de l'IA peuvent être jouées sans écran :
+#
+#     python tetris_engine.py --games 20 --seed 1
+
+import argparse
+import random
+import time
+
+import bitboard
+import search
+from bitboard import GRID_WIDTH, GRID_HEIGHT
+from pieces import SHAPES, SHAPE_COLORS, piece_id
+
+SPAWN_X = GRID_WIDTH // 2 - 1    # Colonne d'apparition des pièces
+
+
+def calculate_score(lines_removed):
+    if lines_removed == 2:
+        return 300
+    elif lines_removed == 3:
+        return 500
+    elif lines_removed == 4:
+        return 800
+    else:
+        return lines_removed * 100
+
+
+def remove_lines(board, colors):
+    # Supprime les lignes pleines de la grille et des couleurs, et ajoute des lignes vides au début
+    new_board, lines_removed = bitboard.clear_lines(board)
+    if lines_removed:
+        colors = ([[None] * GRID_WIDTH for _ in range(lines_removed)] +
+                  [colors[y] for y in range(GRID_HEIGHT) if board[y] != bitboard.FULL])
+    return new_board, colors, lines_removed
+
+
+class TetrisGame:
+    # Une partie : grille (bitboard), couleurs des cases, pièce courante et suivante, score.
+    # Les pièces sont tirées par un générateur aléatoire propre à la partie : deux parties
+    # créées avec la même graine reçoivent les mêmes pièces.
+    # Quand `recorder` est donné (voir replay.ReplayRecorder), chaque pièce posée y est enregistrée,
+    # et quand `dataset` est donné (voir dataset.DatasetWriter), la grille et la pièce aussi.
+
+    def __init__(self, seed=None):
+        self.recorder = None
+        self.dataset = None
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        # Nouvelle partie avec la graine `seed`, tirée au hasard si elle n'est pas donnée :
+        # la graine d'une partie suffit toujours à retrouver ses pièces
+        self.seed = random.randrange(1 << 32) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.board = bitboard.EMPTY_BOARD
+        self.colors = [[None for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+        self.score = 0
+        self.lines = 0
+        self.pieces = 0
+        self.game_over = False
+        self.next_type = self._draw_type()
+        self._spawn()
+
+    def _draw_type(self):
+        return self.rng.choice(list(SHAPES.keys()))
+
+    def _spawn(self):
+        # La pièce suivante devient la pièce courante, en haut de la grille
+        self.current_type = self.next_type
+        self.next_type = self._draw_type()
+        self.shape = SHAPES[self.current_type]
+        self.x = SPAWN_X
+        self.y = 0
+        if self.collides():
+            self.game_over = True
+
+    @property
+    def color(self):
+        return SHAPE_COLORS[self.current_type]
+
+    @property
+    def next_shape(self):
+        return SHAPES[self.next_type]
+
+    @property
+    def next_color(self):
+        return SHAPE_COLORS[self.next_type]
+
+    def collides(self, shape=None, x=None, y=None):
+        # La pièce courante (ou `shape`) chevauche-t-elle la grille ou ses bords en (x, y) ?
+        shape = self.shape if shape is None else shape
+        x = self.x if x is None else x
+        y = self.y if y is None else y
+        return bitboard.collides(self.board, bitboard.shape_masks(shape), len(shape[0]), x, y)
+
+    def place(self, shape, x, y):
+        # Pose la pièce courante dans l'orientation `shape` en (x, y), supprime les lignes
+        # pleines et fait apparaître la pièce suivante. Retourne le nombre de lignes supprimées.
+        if self.recorder is not None:
+            self.recorder.record(piece_id(shape), x, y)
+        if self.dataset is not None:
+            self.dataset.record(self, piece_id(shape), x, y)
+        self.board = bitboard.place(self.board, bitboard.shape_masks(shape), x, y)
+        color = self.color
+        for r, row in enumerate(shape):
+            for c, cell in enumerate(row):
+                if cell:
+                    self.colors[y + r][x + c] = color
+
+        self.board, self.colors, lines_removed = remove_lines(self.board, self.colors)
+        self.score += calculate_score(lines_removed)
+        self.lines += lines_removed
+        self.pieces += 1
+        self._spawn()
+        return lines_removed
+
+    def step(self):
+        # Un pas de gravité : la pièce descend d'une ligne, ou est posée si elle ne peut plus.
+        # Retourne le nombre de lignes supprimées.
+        if self.game_over:
+            return 0
+        if not self.collides(y=self.y + 1):
+            self.y += 1
+            return 0
+        return self.place(self.shape, self.x, self.y)
+
+    def ai_placement(self, **options):
+        # Placement (orientation, x, y) choisi par l'IA pour la pièce courante,
+        # None si elle ne rentre nulle part (options : voir search.best_placement)
+        return search.best_placement(self.board, piece_id(self.shape), piece_id(self.next_shape), **options)
+
+    def play_ai(self, **options):
+        # L'IA pose directement la pièce courante. Retourne le nombre de lignes supprimées.
+        placement = self.ai_placement(**options)
+        if placement is None:
+            self.game_over = True
+            return 0
+        orientation, x, y = placement
+        return self.place(orientation.shape, x, y)
+
+
+def play_headless(games, seed=0, max_pieces=1000, record_dir=None, dataset_dir=None, **options):
+    # Joue `games` parties de l'IA le plus vite possible (graines seed, seed + 1, ...).
+    # Une partie s'arrête au game over ou après `max_pieces` pièces.
+    # Avec `record_dir`, le replay de chaque partie y est écrit (voir replay.py).
+    # Avec `dataset_dir`, chaque pièce posée y est ajoutée aux exemples d'apprentissage (voir dataset.py).
+    if record_dir is not None:
+        from replay import ReplayRecorder
+    writer = None
+    if dataset_dir is not None:
+        from dataset import DatasetWriter
+        writer = DatasetWriter(dataset_dir)
+    results = []
+    elapsed = 0.0
+    for i in range(games):
+        start = time.perf_counter()
+        game = TetrisGame(seed + i)
+        if record_dir is not None:
+            game.recorder = ReplayRecorder(game.seed, {"tucks": options.get("tucks", False),
+                                                       "depth": options.get("depth", 2),
+                                                       "beam_width": options.get("beam_width", 0)})
+        game.dataset = writer
+        while not game.game_over and game.pieces < max_pieces:
+            game.play_ai(**options)
+        elapsed += time.perf_counter() - start
+        if record_dir is not None:
+            game.recorder.save(record_dir)
+        results.append(game)
+    if writer is not None:
+        writer.close()
+
+    pieces = sum(game.pieces for game in results)
+    return {
+        "games": games,
+        "pieces": pieces,
+        "seconds": elapsed,
+        "pieces_per_sec": pieces / elapsed if elapsed else 0.0,
+        "lines_per_game": sum(game.lines for game in results) / games,
+        "score_per_game": sum(game.score for game in results) / games,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parties de l'IA sans affichage")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-pieces", type=int, default=1000)
+    parser.add_argument("--batch", action="store_true", help="notation des grilles par NumPy")
+    parser.add_argument("--workers", type=int, default=0, help="processus pour la recherche")
+    parser.add_argument("--weights", default=search.WEIGHTS_FILE, help="fichier de poids (voir tune_weights.py)")
+    parser.add_argument("--depth", type=int, default=3, help="pièces anticipées par la recherche en faisceau")
+    parser.add_argument("--beam", type=int, default=0, help="largeur du faisceau (0 : recherche complète à 2 pièces)")
+    parser.add_argument("--tucks", action="store_true", help="coups glissés sous les surplombs (voir reachability.py)")
+    parser.add_argument("--record", metavar="DIR", help="enregistrer le replay de chaque partie dans ce dossier")
+    parser.add_argument("--dataset", metavar="DIR", help="ajouter chaque pièce posée aux exemples de ce dossier")
+    args = parser.parse_args()
+
+    search_stats = {}
+    stats = play_headless(args.games, args.seed, args.max_pieces, args.record, args.dataset,
+                          weights=search.load_weights(args.weights), batch=args.batch, workers=args.workers,
+                          depth=args.depth, beam_width=args.beam, stats=search_stats, tucks=args.tucks)
+    print(f"{stats['games']} parties, {stats['pieces']} pièces en {stats['seconds']:.2f} s")
+    print(f"pièces/s : {stats['pieces_per_sec']:.1f}")
+    print(f"lignes/partie : {stats['lines_per_game']:.1f}")
+    print(f"score/partie : {stats['score_per_game']:.1f}")
+    if search_stats:
+        decisions = search_stats['decisions']
+        print(f"nœuds développés/décision : {search_stats['expanded'] / decisions:.1f}")
+        print(f"grilles générées/décision : {search_stats['generated'] / decisions:.1f}")
+
+
+if __name__ == "__main__":
+    main()
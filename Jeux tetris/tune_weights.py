@@ -0,0 +1,168 @@
+# Réglage des poids de l'IA (search.WEIGHTS) par la méthode de l'entropie croisée.
+# À chaque génération, des jeux de poids sont tirés autour de la moyenne courante, chacun est
+# noté par le nombre moyen de lignes sur des parties sans affichage (les mêmes graines pour
+# tous), et la moyenne et l'écart type sont recalculés sur les meilleurs.
+# Les parties sont réparties sur tous les cœurs, et l'état est sauvegardé après chaque
+# génération : une recherche interrompue reprend avec --resume.
+#
+#     python tune_weights.py --generations 30 --population 40 --games 20
+#
+# Chaque génération joue sur des graines différentes : les notes de deux générations ne se
+# comparent pas. Après chaque génération, la nouvelle moyenne et le meilleur candidat sont donc
+# rejoués sur des parties de validation, toujours les mêmes, et les poids gardés sont ceux
+# qui y font le plus de lignes. Ils sont écrits dans weights.json, chargé au démarrage par Tetris_IA.py.
+
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import search
+from tetris_engine import TetrisGame
+
+CHECKPOINT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tune_checkpoint.json')
+
+INITIAL_STD = 0.5     # Écart type de départ de chaque poids
+MIN_STD = 0.02        # Bruit minimum, pour ne pas converger trop tôt
+SMOOTHING = 0.7       # Part de la nouvelle moyenne/écart type à chaque génération
+VALIDATION_SEED = 1 << 31   # Première graine des parties de validation, loin de celles des générations
+
+
+def _play_game(task):
+    # Exécuté dans un processus de calcul : une partie complète de l'IA avec les poids donnés.
+    # Retourne (indice du candidat, lignes supprimées).
+    candidate, weights, seed, max_pieces = task
+    game = TetrisGame(seed)
+    while not game.game_over and game.pieces < max_pieces:
+        game.play_ai(weights=weights)
+    return candidate, game.lines
+
+
+def evaluate(pool, workers, candidates, seeds, max_pieces):
+    # Nombre moyen de lignes de chaque candidat sur les parties `seeds`.
+    # Toutes les parties de la génération sont envoyées d'un coup, par paquets, pour occuper tous les cœurs.
+    tasks = [(i, weights, seed, max_pieces) for i, weights in enumerate(candidates) for seed in seeds]
+    chunksize = max(1, len(tasks) // (workers * 4))
+    totals = [0] * len(candidates)
+    for candidate, lines in pool.map(_play_game, tasks, chunksize=chunksize):
+        totals[candidate] += lines
+    return [total / len(seeds) for total in totals]
+
+
+def sample(rng, mean, std, population):
+    return [{key: rng.gauss(mean[key], std[key]) for key in mean} for _ in range(population)]
+
+
+def new_state():
+    return {
+        "generation": 0,
+        "mean": dict(search.WEIGHTS),
+        "std": {key: INITIAL_STD for key in search.WEIGHTS},
+        "best": dict(search.WEIGHTS),
+        "best_validation": None,
+        "history": [],
+    }
+
+
+def load_checkpoint(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(state, path):
+    # Écriture dans un fichier temporaire puis remplacement : un arrêt pendant
+    # l'écriture ne laisse jamais de sauvegarde à moitié écrite
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=4)
+    os.replace(tmp, path)
+
+
+def run_generation(pool, state, args):
+    generation = state["generation"]
+    # Générateur propre à chaque génération : une reprise tire les mêmes candidats
+    rng = random.Random(args.seed * 100003 + generation)
+    candidates = sample(rng, state["mean"], state["std"], args.population)
+    if generation == 0:
+        candidates[0] = dict(state["mean"])   # Les poids de départ sont notés tels quels
+    seeds = [args.seed * 100003 + generation * args.games + i for i in range(args.games)]
+
+    fitness = evaluate(pool, args.workers, candidates, seeds, args.max_pieces)
+
+    ranked = sorted(range(len(candidates)), key=lambda i: fitness[i], reverse=True)
+    elite = [candidates[i] for i in ranked[:max(2, int(len(candidates) * args.elite))]]
+    for key in state["mean"]:
+        values = [weights[key] for weights in elite]
+        elite_mean = sum(values) / len(values)
+        elite_std = (sum((v - elite_mean) ** 2 for v in values) / len(values)) ** 0.5
+        state["mean"][key] = SMOOTHING * elite_mean + (1 - SMOOTHING) * state["mean"][key]
+        state["std"][key] = max(MIN_STD, SMOOTHING * elite_std + (1 - SMOOTHING) * state["std"][key])
+
+    # La nouvelle moyenne et le meilleur candidat de la génération sont notés sur les parties
+    # de validation : seules ces notes se comparent d'une génération à l'autre
+    best = ranked[0]
+    finalists = [dict(state["mean"]), candidates[best]]
+    validation_seeds = [VALIDATION_SEED + args.seed * 1000 + i for i in range(args.validation_games)]
+    validation = evaluate(pool, args.workers, finalists, validation_seeds, args.max_pieces)
+    chosen = max(range(len(finalists)), key=lambda i: validation[i])
+    if state["best_validation"] is None or validation[chosen] > state["best_validation"]:
+        state["best"] = finalists[chosen]
+        state["best_validation"] = validation[chosen]
+    state["history"].append({
+        "generation": generation,
+        "best": fitness[best],
+        "mean": sum(fitness) / len(fitness),
+        "validation_mean": validation[0],
+        "validation_best": validation[1],
+    })
+    state["generation"] = generation + 1
+    return fitness[best], sum(fitness) / len(fitness), validation
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Réglage des poids de l'IA par entropie croisée")
+    parser.add_argument("--generations", type=int, default=20)
+    parser.add_argument("--population", type=int, default=30, help="candidats par génération")
+    parser.add_argument("--games", type=int, default=10, help="parties par candidat")
+    parser.add_argument("--max-pieces", type=int, default=500, help="pièces au plus par partie")
+    parser.add_argument("--validation-games", type=int, default=20,
+                        help="parties de validation, les mêmes à chaque génération")
+    parser.add_argument("--elite", type=float, default=0.2, help="part des candidats retenus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE)
+    parser.add_argument("--output", default=search.WEIGHTS_FILE, help="fichier des meilleurs poids")
+    parser.add_argument("--resume", action="store_true", help="reprendre depuis la sauvegarde")
+    args = parser.parse_args()
+
+    if args.resume and os.path.exists(args.checkpoint):
+        state = load_checkpoint(args.checkpoint)
+        print(f"Reprise à la génération {state['generation']}")
+    else:
+        state = new_state()
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        while state["generation"] < args.generations:
+            start = time.perf_counter()
+            best, mean, validation = run_generation(pool, state, args)
+            elapsed = time.perf_counter() - start
+            games = args.population * args.games + 2 * args.validation_games
+            print(f"génération {state['generation']} : meilleur {best:.1f} lignes, moyenne {mean:.1f}, "
+                  f"validation {validation[0]:.1f} (moyenne) / {validation[1]:.1f} (meilleur) "
+                  f"({games} parties en {elapsed:.1f} s, {games / elapsed:.1f} parties/s)")
+            save_checkpoint(state, args.checkpoint)
+            search.save_weights(state["best"], args.output)
+
+    if state["best_validation"] is None:
+        # Aucune génération jouée (--generations 0) : rien n'a été noté ni enregistré
+        print("Aucune génération jouée, poids de départ :")
+    else:
+        print(f"Meilleurs poids ({state['best_validation']:.1f} lignes/partie de validation) : {args.output}")
+    for key, value in state["best"].items():
+        print(f"    {key} : {value:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# Plusieurs parties de Tetris jouées en même temps, avec les règles de tetris_engine.py :
+# les N grilles sont un seul tableau (N, GRID_HEIGHT) de masques de lignes (voir bitboard.py),
+# et chaque pas pose une pièce sur toutes les grilles à la fois (chute, lignes pleines, score,
+# game over) par des opérations NumPy, sans boucle Python sur les parties.
+#
+#     python vector_env.py --boards 2000 --steps 500
+#
+# Les coups d'une pièce sont ceux de search.get_placements : chaque orientation lâchée tout
+# droit depuis le haut de la grille, dans chaque colonne. Ils sont numérotés par type de pièce
+# (voir batch_eval.MOVES, où sont aussi la chute et la pose en lot) et step() reçoit un numéro de
+# coup par grille. greedy_moves() choisit pour toutes les grilles le coup dont la grille obtenue
+# a le meilleur score (batch_eval.score_boards) : l'IA à une pièce, sans la pièce suivante.
+# Les parties terminées (game over ou `max_pieces` pièces) recommencent aussitôt sur une grille
+# vide ; leurs résultats sont ajoutés aux totaux de l'environnement.
+# Les couleurs des cases ne sont pas gardées : il n'y a rien à afficher.
+
+import argparse
+import time
+
+import numpy as np
+
+import search
+from batch_eval import PIECE_TYPES, MAX_MOVES, MOVE_MASKS, score_boards, windows, drop_rows, placed_rows
+from bitboard import GRID_HEIGHT, FULL
+from pieces import ORIENTATIONS
+from tetris_engine import SPAWN_X, calculate_score
+
+LINE_SCORES = np.array([calculate_score(n) for n in range(5)], dtype=np.int64)
+
+# Masques de chaque pièce à son apparition, en colonne SPAWN_X
+SPAWN_MASKS = np.zeros((len(PIECE_TYPES), 4), dtype=np.int32)
+for t, key in enumerate(PIECE_TYPES):
+    o = ORIENTATIONS[key][0]
+    SPAWN_MASKS[t, :o.height] = [mask << SPAWN_X for mask in o.masks]
+
+
+def clear_lines(rows):
+    # Supprime les lignes pleines de chaque grille et ajoute des lignes vides en haut,
+    # retourne les nouvelles grilles et le nombre de lignes supprimées par grille
+    full = rows == FULL
+    removed = full.sum(axis=1)
+    cleared = removed > 0
+    if cleared.any():
+        # Tri stable : les lignes pleines passent en haut, les autres gardent leur ordre
+        order = np.argsort(~full[cleared], axis=1, kind="stable")
+        kept = np.take_along_axis(rows[cleared], order, axis=1)
+        kept[np.arange(GRID_HEIGHT) < removed[cleared, None]] = 0
+        rows = rows.copy()
+        rows[cleared] = kept
+    return rows, removed
+
+
+class VectorTetris:
+    # N parties jouées en même temps. Pour chaque grille : lignes (rows), type de la pièce
+    # courante et suivante (indices dans PIECE_TYPES), score, lignes supprimées et pièces posées.
+    # Les pièces sont tirées par un générateur propre à l'environnement : deux environnements
+    # créés avec la même graine et recevant les mêmes coups jouent les mêmes parties.
+
+    def __init__(self, n, seed=None, max_pieces=None):
+        self.n = n
+        self.max_pieces = max_pieces
+        self.rng = np.random.default_rng(seed)
+        self.rows = np.zeros((n, GRID_HEIGHT), dtype=np.int32)
+        self.current = self._draw_types(n)
+        self.next = self._draw_types(n)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.lines = np.zeros(n, dtype=np.int64)
+        self.pieces = np.zeros(n, dtype=np.int64)
+        # Totaux des parties terminées
+        self.games = 0
+        self.total_pieces = 0
+        self.total_lines = 0
+        self.total_score = 0
+
+    def _draw_types(self, n):
+        return self.rng.integers(len(PIECE_TYPES), size=n)
+
+    def move_masks(self):
+        # Masques de tous les coups de la pièce courante de chaque grille : (N, MAX_MOVES, 4)
+        return MOVE_MASKS[self.current]
+
+    def greedy_moves(self, weights=search.WEIGHTS):
+        # Numéro du meilleur coup de chaque grille : toutes les grilles obtenues (N * MAX_MOVES)
+        # sont notées en un seul appel, les coups qui ne rentrent pas sont écartés
+        masks = self.move_masks()
+        y = drop_rows(self.rows, masks)
+        boards = placed_rows(self.rows, masks, y)
+        scores = score_boards(boards.reshape(-1, GRID_HEIGHT), weights).reshape(self.n, MAX_MOVES)
+        return np.where(y >= 0, scores, -np.inf).argmax(axis=1)
+
+    def step(self, moves):
+        # Pose la pièce courante de chaque grille avec le coup moves[i] (voir batch_eval.MOVES),
+        # supprime les lignes pleines et fait apparaître la pièce suivante. Un coup qui ne rentre
+        # pas termine la partie, comme une pièce suivante qui chevauche la grille à son apparition.
+        # Retourne (lignes supprimées, parties terminées) par grille ; les parties terminées
+        # sont déjà remplacées par des parties neuves.
+        boards = np.arange(self.n)
+        masks = MOVE_MASKS[self.current, moves][:, None]
+        y = drop_rows(self.rows, masks)[:, 0]
+        fits = y >= 0
+
+        rows = np.where(fits[:, None], placed_rows(self.rows, masks, y[:, None])[:, 0], self.rows)
+        rows, removed = clear_lines(rows)
+        self.rows = rows
+        self.score += LINE_SCORES[removed]
+        self.lines += removed
+        self.pieces += fits
+
+        self.current = self.next
+        self.next = self._draw_types(self.n)
+        spawn = windows(rows)[boards, 0] & SPAWN_MASKS[self.current]
+        done = ~fits | spawn.any(axis=1)
+        if self.max_pieces is not None:
+            done |= self.pieces >= self.max_pieces
+        if done.any():
+            self._restart(done)
+        return removed, done
+
+    def _restart(self, done):
+        self.games += int(done.sum())
+        self.total_pieces += int(self.pieces[done].sum())
+        self.total_lines += int(self.lines[done].sum())
+        self.total_score += int(self.score[done].sum())
+        self.rows[done] = 0
+        self.score[done] = 0
+        self.lines[done] = 0
+        self.pieces[done] = 0
+        # La pièce courante, déjà tirée, reste celle de la nouvelle partie
+
+
+def play_vectorized(boards, steps, seed=0, max_pieces=None, weights=search.WEIGHTS):
+    # Joue `steps` pièces sur chacune des `boards` grilles avec greedy_moves
+    env = VectorTetris(boards, seed, max_pieces)
+    start = time.perf_counter()
+    for _ in range(steps):
+        env.step(env.greedy_moves(weights))
+    elapsed = time.perf_counter() - start
+
+    pieces = env.total_pieces + int(env.pieces.sum())
+    return {
+        "boards": boards,
+        "pieces": pieces,
+        "seconds": elapsed,
+        "pieces_per_sec": pieces / elapsed if elapsed else 0.0,
+        "games_finished": env.games,
+        "lines_per_game": env.total_lines / env.games if env.games else 0.0,
+        "score_per_game": env.total_score / env.games if env.games else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parties de Tetris jouées en lot par NumPy")
+    parser.add_argument("--boards", type=int, default=1000, help="parties jouées en même temps")
+    parser.add_argument("--steps", type=int, default=500, help="pièces posées sur chaque grille")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-pieces", type=int, help="pièces au bout desquelles une partie recommence")
+    parser.add_argument("--weights", default=search.WEIGHTS_FILE, help="fichier de poids (voir tune_weights.py)")
+    args = parser.parse_args()
+
+    stats = play_vectorized(args.boards, args.steps, args.seed, args.max_pieces, search.load_weights(args.weights))
+    print(f"{stats['boards']} grilles, {stats['pieces']} pièces en {stats['seconds']:.2f} s")
+    print(f"pièces/s : {stats['pieces_per_sec']:.1f}")
+    print(f"parties terminées : {stats['games_finished']}")
+    if stats['games_finished']:
+        print(f"lignes/partie : {stats['lines_per_game']:.1f}")
+        print(f"score/partie : {stats['score_per_game']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
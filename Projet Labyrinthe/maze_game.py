@@ -1,7 +1,15 @@
 import pygame
 import random
 import heapq
+from collections import deque
 import math
+import os
+import sys
+
+# Ressources partagées entre les jeux (resources.py, à la racine du dépôt)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import resources
+import telemetry
 
 WIDTH, HEIGHT = 800, 600
 ROWS, COLS = 30, 40
@@ -16,10 +24,16 @@ BLUE = (0, 0, 255)
 LIGHT_RED = (255, 200, 200)
 YELLOW = (255, 255, 0)
 
-# Initialization of Pygame
-pygame.init()
-SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Labyrinthe")
+# Fenêtre créée par init() au lancement du jeu, pas à l'import du module
+SCREEN = None
+
+def init():
+    global SCREEN
+    # Initialization of Pygame
+    pygame.init()
+    SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Labyrinthe")
+    telemetry.start("labyrinthe")
 
 
 def distance(p1, p2):
@@ -108,15 +122,12 @@ class Soldier:
         return True
     
     def choose_random_target(self, maze):
-        while True:
-            target_x = random.randint(1, COLS - 2)  #pas les contours de l'arène
-            target_y = random.randint(1, ROWS - 2)
-            if maze[target_y][target_x] == 0:
-                self.target = (target_x, target_y)
-                path_found, _, path = a_star(maze, (self.x, self.y), self.target)
-                if path_found:
-                    self.path = path[1:]  # Exclude the current position
-                    break
+        # Cible tirée parmi les cases de la région du soldat (pas les contours de l'arène) :
+        # elle est toujours atteignable, plus besoin de tirer jusqu'à ce qu'un chemin existe
+        target = grid_search(maze).random_reachable_cell((self.x, self.y))
+        if target is not None:
+            self.target = target
+            self.path = a_star(maze, (self.x, self.y), target)[2][1:]  # Exclude the current position
 
     def move_towards_player(self, player, maze):
         self.move_counter += 1
@@ -124,9 +135,11 @@ class Soldier:
             self.move_counter = 0
 
             if abs(self.x - player.x) <= self.vision_range and abs(self.y - player.y) <= self.vision_range: 
-                path_found, _, path = a_star(maze, (self.x, self.y), (player.x, player.y))
-                if path_found:
-                    self.path = path[1:]  # Exclude the current position
+                # Seul le prochain pas sert : il est lu dans le champ de distances au joueur
+                field = distance_field(maze, (player.x, player.y))
+                if field.distance((self.x, self.y)) is not None:
+                    step = field.next_step((self.x, self.y))
+                    self.path = [step] if step is not None else []
                 self.target = None
                 #print("en chasse")
             else:
@@ -137,56 +150,231 @@ class Soldier:
                 next_move = self.path.pop(0)
                 self.x, self.y = next_move
 
-def heuristic(a, b):
-    return abs(a[0] - b[0]) + abs(a[1] - b[1])
-
-def reconstruct_path(came_from, start, goal):
-    current = goal
-    path = []
-    while current != start:
-        path.append(current)
-        current = came_from[current]
-    path.append(start)
-    path.reverse()
-    return path
-
-def a_star(maze, start, goal):
+class GridSearch:
+    # A* sur une grille qui ne change pas : chaque case est un indice entier i = x * rows + y,
+    # et ses voisins libres sont calculés une fois pour toutes, dans l'ordre bas, haut, droite, gauche.
+    # Les coûts (g) et les parents des cases sont dans des listes réutilisées d'une recherche à
+    # l'autre : une case n'est valable que si son numéro de génération est celui de la recherche
+    # en cours, ce qui évite de vider les listes à chaque appel.
+    # Une entrée du tas est l'entier f * cases + i : à f égal, la case de plus petit (x, y) sort
+    # la première, comme avec les tuples (f, (x, y)), et les chemins trouvés sont les mêmes.
+
+    def __init__(self, maze):
+        self.maze = maze
+        rows, cols = len(maze), len(maze[0])
+        self.rows = rows
+        self.size = rows * cols
+        self.xs = [i // rows for i in range(self.size)]
+        self.ys = [i % rows for i in range(self.size)]
+        self.neighbors = []
+        for i in range(self.size):
+            x, y = self.xs[i], self.ys[i]
+            cells = []
+            for dx, dy in ((0, 1), (0, -1), (1, 0), (-1, 0)):
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < cols and 0 <= ny < rows and maze[ny][nx] != 1:
+                    cells.append(nx * rows + ny)
+            self.neighbors.append(tuple(cells))
+        self.g = [0] * self.size
+        self.parent = [0] * self.size
+        self.seen = [0] * self.size      # Génération où g et parent de la case ont été écrits
+        self.closed = [0] * self.size    # Génération où la case a été développée
+        self.generation = 0
+        self.component = None            # Région libre connexe de chaque case (voir label_components)
+        self.component_cells = None
+
+    def label_components(self):
+        # Numérote les régions libres connexes : component[i] est la région de la case i (-1 pour
+        # un mur), et component_cells[c] la liste des cases (x, y) de la région c où une cible de
+        # patrouille peut être choisie (libres, hors contour du labyrinthe)
+        maze, rows, cols = self.maze, self.rows, self.size // self.rows
+        xs, ys, neighbors = self.xs, self.ys, self.neighbors
+        component = [-1] * self.size
+        component_cells = []
+        for i in range(self.size):
+            if component[i] != -1 or maze[ys[i]][xs[i]] == 1:
+                continue
+            c = len(component_cells)
+            component[i] = c
+            cells = []
+            stack = [i]
+            while stack:
+                current = stack.pop()
+                x, y = xs[current], ys[current]
+                if 1 <= x <= cols - 2 and 1 <= y <= rows - 2 and maze[y][x] == 0:
+                    cells.append((x, y))
+                for neighbor in neighbors[current]:
+                    if component[neighbor] == -1:
+                        component[neighbor] = c
+                        stack.append(neighbor)
+            component_cells.append(cells)
+        self.component = component
+        self.component_cells = component_cells
+
+    def random_reachable_cell(self, cell):
+        # Case tirée au hasard, uniformément, parmi les cibles de patrouille de la région de `cell` :
+        # un chemin y mène toujours. None si la région n'en a aucune.
+        if self.component is None:
+            self.label_components()
+        c = self.component[cell[0] * self.rows + cell[1]]
+        if c == -1 or not self.component_cells[c]:
+            return None
+        return random.choice(self.component_cells[c])
+
+    def search(self, start, goal, record_steps=False):
+        # Retourne (chemin trouvé, cases développées dans l'ordre si record_steps sinon None,
+        # chemin de start à goal inclus ou None) et le nombre de cases développées
+        self.generation += 1
+        generation = self.generation
+        rows, size = self.rows, self.size
+        xs, ys, neighbors = self.xs, self.ys, self.neighbors
+        g, parent, seen, closed = self.g, self.parent, self.seen, self.closed
+        source = start[0] * rows + start[1]
+        target = goal[0] * rows + goal[1]
+        gx, gy = goal
+
+        g[source] = 0
+        seen[source] = generation
+        open_set = [source]
+        steps = [] if record_steps else None
+        expanded = 0
+        while open_set:
+            current = heapq.heappop(open_set) % size
+            if closed[current] == generation:
+                continue    # Entrée remplacée depuis par un coût plus faible
+            closed[current] = generation
+            expanded += 1
+            if steps is not None:
+                steps.append((xs[current], ys[current]))
+
+            if current == target:
+                path = [(xs[current], ys[current])]
+                while current != source:
+                    current = parent[current]
+                    path.append((xs[current], ys[current]))
+                path.reverse()
+                return True, steps, path, expanded
+
+            tentative_g_score = g[current] + 1
+            for neighbor in neighbors[current]:
+                if closed[neighbor] == generation:
+                    continue    # Jamais de nouvelle entrée pour une case déjà développée
+                if seen[neighbor] != generation or tentative_g_score < g[neighbor]:
+                    seen[neighbor] = generation
+                    g[neighbor] = tentative_g_score
+                    parent[neighbor] = current
+                    f_score = tentative_g_score + abs(xs[neighbor] - gx) + abs(ys[neighbor] - gy)
+                    heapq.heappush(open_set, f_score * size + neighbor)
+
+        return False, steps, None, expanded
+
+
+class DistanceField:
+    # Distance en pas de chaque case à une case source (celle du joueur), partagée par tous les
+    # soldats : un soldat en chasse fait le pas qui rapproche le plus du joueur, sans chercher de
+    # chemin. Le parcours en largeur depuis la source ne va pas plus loin que nécessaire : il
+    # continue à la demande jusqu'à la case demandée, et les soldats proches du joueur n'en
+    # explorent qu'une petite partie. Il recommence seulement quand le joueur change de case.
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.dist = [0] * grid.size
+        self.seen = [0] * grid.size      # Génération où la distance de la case a été trouvée
+        self.generation = 0
+        self.source = None
+        self.frontier = deque()
+
+    def set_source(self, cell):
+        if cell == self.source:
+            return
+        self.source = cell
+        self.generation += 1
+        i = cell[0] * self.grid.rows + cell[1]
+        self.dist[i] = 0
+        self.seen[i] = self.generation
+        self.frontier = deque([i])
+        telemetry.count("flow.fields")
+
+    def _distance(self, i):
+        # Distance de la case d'indice i à la source, None si elle n'est pas atteignable
+        generation, seen, dist = self.generation, self.seen, self.dist
+        neighbors, frontier = self.grid.neighbors, self.frontier
+        expanded = 0
+        while seen[i] != generation and frontier:
+            current = frontier.popleft()
+            expanded += 1
+            d = dist[current] + 1
+            for neighbor in neighbors[current]:
+                if seen[neighbor] != generation:
+                    seen[neighbor] = generation
+                    dist[neighbor] = d
+                    frontier.append(neighbor)
+        telemetry.count("flow.expansions", expanded)
+        return dist[i] if seen[i] == generation else None
+
+    def distance(self, cell):
+        return self._distance(cell[0] * self.grid.rows + cell[1])
+
+    def next_step(self, cell):
+        # Case voisine d'un plus court chemin de `cell` à la source (la première dans l'ordre
+        # bas, haut, droite, gauche), None si `cell` est la source ou n'est pas atteignable.
+        # Quand une case est atteinte, toutes les cases plus proches d'un pas le sont déjà.
+        grid = self.grid
+        i = cell[0] * grid.rows + cell[1]
+        d = self._distance(i)
+        if not d:
+            return None
+        for neighbor in grid.neighbors[i]:
+            if self.seen[neighbor] == self.generation and self.dist[neighbor] == d - 1:
+                return grid.xs[neighbor], grid.ys[neighbor]
+
+
+_grid_search = None
+_distance_field = None
+
+
+def grid_search(maze):
+    # GridSearch de `maze`, créé au premier appel : `maze` ne doit plus changer ensuite
+    global _grid_search
+    if _grid_search is None or _grid_search.maze is not maze:
+        _grid_search = GridSearch(maze)
+    return _grid_search
+
+
+def distance_field(maze, source):
+    # Champ de distances vers la case `source`, le même pour tous les appelants
+    global _distance_field
+    grid = grid_search(maze)
+    if _distance_field is None or _distance_field.grid is not grid:
+        _distance_field = DistanceField(grid)
+    _distance_field.set_source(source)
+    return _distance_field
+
+
+def a_star(maze, start, goal, record_steps=False):
+    # Plus court chemin de start à goal, (x, y) en cases : retourne (chemin trouvé, cases
+    # développées dans l'ordre si record_steps sinon None, chemin de start à goal inclus)
+    found, steps, path, expanded = grid_search(maze).search(start, goal, record_steps)
+    telemetry.count("astar.calls")
+    telemetry.count("astar.expansions", expanded)
+    return found, steps, path
+
+def reachable(maze, start, goal):
+    # Parcours en largeur direct sur la grille : suffit pour écarter les labyrinthes sans chemin,
+    # sans construire de GridSearch pour chacun d'eux
     rows, cols = len(maze), len(maze[0])
-    open_set = []
-    heapq.heappush(open_set, (0, start))
-    came_from = {}
-    g_score = {start: 0}
-    f_score = {start: heuristic(start, goal)}
-    closed_set = set()
-    search_steps = []
-
-    while open_set:
-        current = heapq.heappop(open_set)[1]
-        search_steps.append(current)
-        closed_set.add(current)
-
-        if current == goal:
-            path = reconstruct_path(came_from, start, goal)
-            return True, search_steps, path
-
-        neighbors = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-        for dx, dy in neighbors:
-            neighbor = (current[0] + dx, current[1] + dy)
-            if 0 <= neighbor[0] < cols and 0 <= neighbor[1] < rows:
-                if maze[neighbor[1]][neighbor[0]] == 1:
-                    continue
-                tentative_g_score = g_score[current] + 1
-
-                if neighbor in closed_set:
-                    continue
-
-                if neighbor not in g_score or tentative_g_score < g_score[neighbor]:
-                    came_from[neighbor] = current
-                    g_score[neighbor] = tentative_g_score
-                    f_score[neighbor] = tentative_g_score + heuristic(neighbor, goal)
-                    heapq.heappush(open_set, (f_score[neighbor], neighbor))
-
-    return False, search_steps, None
+    seen = [[False] * cols for _ in range(rows)]
+    seen[start[1]][start[0]] = True
+    frontier = deque([start])
+    while frontier:
+        x, y = frontier.popleft()
+        if (x, y) == goal:
+            return True
+        for nx, ny in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+            if 0 <= nx < cols and 0 <= ny < rows and not seen[ny][nx] and maze[ny][nx] != 1:
+                seen[ny][nx] = True
+                frontier.append((nx, ny))
+    return False
 
 def generate_maze(rows, cols):
     while True:
@@ -198,9 +386,9 @@ def generate_maze(rows, cols):
         maze[1][1] = 0
         maze[rows - 2][cols - 2] = 0  # Create exit
 
-        #Vérifie qu'un chemin est possible
-        path_exists, search_steps, path = a_star(maze, (1, 1), (COLS - 2, ROWS - 2))
-        if path_exists:
+        #Vérifie qu'un chemin est possible ; A* (et son GridSearch) seulement pour le labyrinthe retenu
+        if reachable(maze, (1, 1), (cols - 2, rows - 2)):
+            path_exists, search_steps, path = a_star(maze, (1, 1), (cols - 2, rows - 2), record_steps=True)
             return maze, search_steps, path
 
 def draw_maze(SCREEN, maze):
@@ -212,8 +400,7 @@ def draw_maze(SCREEN, maze):
     pygame.draw.rect(SCREEN, BLUE, ((COLS - 2) * BLOCK_SIZE, (ROWS - 2) * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE))
 
 def display_message(message):
-    font1 = pygame.font.SysFont("comicsansms", 48)
-    label1 = font1.render(message, True, WHITE)
+    label1 = resources.render_text(message, 48, WHITE, "comicsansms")
 
     message_surface = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
     message_surface.fill((0, 0, 0, 180))  # Remplir avec un fond transparent
@@ -226,6 +413,7 @@ def display_message(message):
     pygame.time.delay(5000)
 
 def main():
+    init()
     clock = pygame.time.Clock()
     maze, search_steps, path = generate_maze(ROWS, COLS)
     game_over = False
@@ -249,6 +437,7 @@ def main():
         pygame.draw.rect(SCREEN, YELLOW, (x * BLOCK_SIZE, y * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE))
         search_step_index += 1
         pygame.display.flip()
+        resources.first_frame_shown()
         pygame.time.delay(10)  # Delay to clearly show the path
 
     # Once A* search is complete, show the final path
@@ -263,7 +452,10 @@ def main():
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 game_over = True
-        
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                telemetry.toggle_hud()
+        telemetry.lap("events")
+
         keys = pygame.key.get_pressed()
         dx, dy = 0, 0
         if keys[pygame.K_LEFT]:
@@ -286,15 +478,21 @@ def main():
         if int(player.x) == COLS - 2 and int(player.y) == ROWS - 2:
             display_message("You win !")
             game_over = True
+        telemetry.lap("update")
 
         SCREEN.fill(WHITE)
         draw_maze(SCREEN, maze)
         player.draw(SCREEN)
         for soldier in soldiers:
             soldier.draw(SCREEN)
+        telemetry.draw_hud(SCREEN)
+        telemetry.lap("render")
 
         pygame.display.update()
+        telemetry.lap("display")
         clock.tick(FPS)
+        telemetry.lap("idle")
+        telemetry.end_frame()
    
     pygame.quit()
 
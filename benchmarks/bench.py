@@ -0,0 +1,284 @@
+# Mesure des fonctions les plus appelées des trois jeux, sans affichage, sur des grilles et
+# des graines fixes. Les résultats sont écrits en JSON et comparés à une référence enregistrée :
+# une baisse de débit de plus de --threshold fait échouer.
+#
+#     python benchmarks/bench.py --save-baseline      # enregistre la référence
+#     python benchmarks/bench.py                      # compare à la référence
+#     python benchmarks/bench.py --filter maze        # seulement les mesures dont le nom contient "maze"
+#
+# La référence dépend de la machine : elle n'est pas dans le dépôt. Il faut l'enregistrer une
+# fois avec --save-baseline (sur la version de départ) avant de comparer ; sans elle, le script
+# le signale et échoue (code 2) au lieu de réussir sans rien avoir comparé.
+#
+# Pour chaque mesure :
+# - le débit (opérations/s) est mesuré sur des échantillons d'au moins 1 ms enchaînant plusieurs appels ;
+# - p50 et p99 sont les latences d'un seul appel de la mesure, chronométré à part (un appel fait
+#   `ops` opérations : pour les mesures qui en regroupent plusieurs, c'est la latence du groupe).
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import time
+from importlib.machinery import SourceFileLoader
+
+# Pas de fenêtre ni de son : les jeux sont importés sans affichage
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_FILE = os.path.join(BENCH_DIR, "results.json")
+CACHED_PIECES = 20    # Pièces jouées par partie dans tetris.best_placement.cached
+
+sys.path.insert(0, os.path.join(ROOT, "Jeux tetris"))
+sys.path.insert(0, os.path.join(ROOT, "Projet Labyrinthe"))
+
+
+def load_snake():
+    # Le fichier s'appelle "snake,py" : il ne peut pas être importé par son nom
+    path = os.path.join(ROOT, "Snake", "snake,py")
+    spec = importlib.util.spec_from_file_location("snake", path, loader=SourceFileLoader("snake", path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+#_______________Mesures______________________
+
+class Case:
+    # Une mesure : `func` est appelée sans argument et effectue `ops` opérations.
+    # `extra`, s'il est donné, est appelé après la mesure : le dictionnaire qu'il retourne est
+    # ajouté aux résultats (et affiché), par exemple les taux de succès d'un cache.
+    def __init__(self, name, func, ops=1, extra=None):
+        self.name = name
+        self.func = func
+        self.ops = ops
+        self.extra = extra
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def run_case(case, min_time, min_samples):
+    func = case.func
+    func()  # Échauffement
+
+    # Nombre d'appels par échantillon, pour qu'un échantillon dure au moins 1 ms
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - start >= 0.001:
+            break
+        number *= 2
+
+    samples = []
+    end = time.perf_counter() + min_time
+    while len(samples) < min_samples or time.perf_counter() < end:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / (number * case.ops))
+
+    # Latence d'un seul appel : chaque appel est chronométré séparément, pour que les appels
+    # lents ne soient pas noyés dans la moyenne d'un échantillon
+    calls = []
+    end = time.perf_counter() + min_time
+    while len(calls) < min_samples * 10 or time.perf_counter() < end:
+        start = time.perf_counter()
+        func()
+        calls.append(time.perf_counter() - start)
+
+    total = sum(samples)
+    calls.sort()
+    extra = case.extra() if case.extra else {}
+    return extra | {
+        "ops_per_sec": len(samples) / total,
+        "call_p50_us": percentile(calls, 0.50) * 1e6,
+        "call_p99_us": percentile(calls, 0.99) * 1e6,
+        "call_max_us": calls[-1] * 1e6,
+        "ops_per_call": case.ops,
+        "samples": len(samples),
+        "ops_per_sample": number * case.ops,
+        "calls": len(calls),
+    }
+
+
+#_______________Cas mesurés______________________
+
+def tetris_cases():
+    import Tetris_IA
+    import cache
+    import tetris_engine
+    from pieces import SHAPES
+
+    block = Tetris_IA.BLOCK_SIZE
+
+    # Grille de milieu de partie : 60 pièces jouées par l'IA sur une graine fixe
+    game = tetris_engine.TetrisGame(seed=1)
+    for _ in range(60):
+        game.play_ai()
+    board = game.board
+    shapes = list(SHAPES.values())
+    positions = [(shape, (x * block, y * block)) for shape in shapes
+                 for x in range(0, 10 - len(shape[0]) + 1, 2) for y in range(0, 18, 3)]
+    moves = Tetris_IA.get_possible_moves(board, shapes[2])
+    pairs = [(shapes[i], shapes[(i + 3) % len(shapes)]) for i in range(len(shapes))]
+
+    # Grille avec 4 lignes pleines pour la suppression de lignes
+    full_board = board[:16] + (tetris_engine.bitboard.FULL,) * 4
+    colors = [[None] * 10 for _ in range(20)]
+
+    # Début de partie joué par l'IA avec un cache neuf : taux de succès de chaque cache sur
+    # des pièces successives, ceux de la dernière partie mesurée
+    last_cache = [None]
+
+    def cached_game():
+        search_cache = cache.SearchCache()
+        last_cache[0] = search_cache
+        game = tetris_engine.TetrisGame(seed=2)
+        for _ in range(CACHED_PIECES):
+            game.play_ai(batch=True, search_cache=search_cache)
+
+    def cache_hit_rates():
+        rates = {}
+        for name, lru in last_cache[0].caches():
+            lookups = lru.hits + lru.misses
+            rates[f"{name}_hit_rate"] = lru.hits / lookups if lookups else 0.0
+        return rates
+
+    return [
+        Case("tetris.best_placement.cached", cached_game, CACHED_PIECES, cache_hit_rates),
+        Case("tetris.check_collision",
+             lambda: [Tetris_IA.check_collision(board, shape, offset) for shape, offset in positions],
+             len(positions)),
+        Case("tetris.get_possible_moves",
+             lambda: [Tetris_IA.get_possible_moves(board, shape) for shape in shapes], len(shapes)),
+        Case("tetris.evaluate_move",
+             lambda: [Tetris_IA.evaluate_move(shape, next_shape, grid=board) for shape, next_shape in pairs],
+             len(pairs)),
+        Case("tetris.evaluate_move.batch",
+             lambda: [Tetris_IA.evaluate_move(shape, next_shape, batch=True, grid=board)
+                      for shape, next_shape in pairs],
+             len(pairs)),
+        Case("tetris.remove_lines", lambda: tetris_engine.remove_lines(full_board, colors)),
+        Case("tetris.simul_placement",
+             lambda: [Tetris_IA.simul_placement(board, shape, position) for shape, position in moves],
+             len(moves)),
+    ]
+
+
+def maze_cases():
+    import maze_game
+
+    random.seed(0)
+    maze, _, _ = maze_game.generate_maze(maze_game.ROWS, maze_game.COLS)
+    start = (1, 1)
+    goal = (maze_game.COLS - 2, maze_game.ROWS - 2)
+    cases = [Case("maze.a_star", lambda: maze_game.a_star(maze, start, goal))]
+
+    for rows, cols in [(15, 20), (30, 40), (60, 80)]:
+        def generate(rows=rows, cols=cols):
+            # Même graine à chaque appel : les mêmes labyrinthes sont tirés
+            random.seed(rows * cols)
+            return maze_game.generate_maze(rows, cols)
+        cases.append(Case(f"maze.generate_maze.{rows}x{cols}", generate))
+    return cases
+
+
+def snake_cases():
+    snake = load_snake()
+    snake.init()    # tick() dessine dans la fenêtre du jeu
+
+    # Serpent de 40 segments qui descend le long du bord droit, la pomme hors de son chemin
+    body = [[x, 5] for x in range(0, snake.GRID_WIDTH - 2)] + [[snake.GRID_WIDTH - 3, y] for y in range(6, 18)]
+    head_x, head_y = body[-1]
+    food = [1, 1]
+
+    def tick():
+        return snake.tick(list(body), len(body), head_x, head_y, 0, 1, food)
+    return [Case("snake.tick", tick)]
+
+
+SUITES = [tetris_cases, maze_cases, snake_cases]
+
+
+#_______________Comparaison______________________
+
+def compare(results, baseline, threshold):
+    # Liste des mesures dont le débit a baissé de plus de `threshold` (0.2 : 20 %)
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            print(f"  {name:32s} (pas de référence)")
+            continue
+        ratio = result["ops_per_sec"] / reference["ops_per_sec"]
+        status = "RÉGRESSION" if ratio < 1 - threshold else "ok"
+        print(f"  {name:32s} {ratio:6.2f}x  {status}")
+        if ratio < 1 - threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesures de performance des jeux")
+    parser.add_argument("--filter", default="", help="ne mesurer que les noms contenant ce texte")
+    parser.add_argument("--min-time", type=float, default=1.0, help="durée minimale par mesure (s)")
+    parser.add_argument("--min-samples", type=int, default=20)
+    parser.add_argument("--output", default=RESULTS_FILE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--threshold", type=float, default=0.2, help="baisse de débit tolérée (0.2 : 20 %%)")
+    parser.add_argument("--save-baseline", action="store_true", help="enregistrer les résultats comme référence")
+    args = parser.parse_args()
+
+    results = {}
+    for suite in SUITES:
+        for case in suite():
+            if args.filter not in case.name:
+                continue
+            result = run_case(case, args.min_time, args.min_samples)
+            results[case.name] = result
+            print(f"{case.name:32s} {result['ops_per_sec']:12.1f} op/s   par appel ({case.ops} op) : "
+                  f"p50 {result['call_p50_us']:10.2f} µs   p99 {result['call_p99_us']:10.2f} µs")
+            if case.extra:
+                print(" " * 33 + "   ".join(f"{key} {value:.3f}" for key, value in case.extra().items()))
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"Référence enregistrée : {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"ÉCHEC : pas de référence ({args.baseline}), rien n'a été comparé.")
+        print("Enregistrer d'abord la référence avec --save-baseline (voir l'en-tête de ce fichier).")
+        return 2
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    print(f"Comparaison avec {args.baseline} (seuil {args.threshold:.0%}) :")
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} régression(s) : {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
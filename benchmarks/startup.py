@@ -0,0 +1,70 @@
+# Temps de démarrage des jeux, chacun lancé dans un nouveau processus Python sans affichage :
+# - import : temps pour importer le module du jeu (sans lancer la partie),
+# - première image : temps jusqu'à ce que le jeu ait affiché sa première image
+#   (le jeu est lancé avec GAMES_STARTUP_TIME=1 et s'arrête à ce moment, voir resources.py).
+# Le temps de démarrage de l'interpréteur seul est mesuré à part et retiré des deux.
+#
+#     python benchmarks/startup.py --runs 10 --output startup.json
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (nom, dossier, script, code Python qui importe le module sans lancer le jeu)
+GAMES = [
+    ("tetris_ia", "Jeux tetris", "Tetris_IA.py", "import Tetris_IA"),
+    ("tetris_player", "Jeux tetris", "Tetris_Player.py", "import Tetris_Player"),
+    ("labyrinthe", "Projet Labyrinthe", "maze_game.py", "import maze_game"),
+    ("snake", "Snake", "snake,py",
+     "import importlib.util as u, importlib.machinery as m; "
+     "s = u.spec_from_file_location('snake', 'snake,py', loader=m.SourceFileLoader('snake', 'snake,py')); "
+     "s.loader.exec_module(u.module_from_spec(s))"),
+]
+
+
+def run(args, cwd, env):
+    start = time.perf_counter()
+    subprocess.run(args, cwd=cwd, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps de démarrage des jeux")
+    parser.add_argument("--runs", type=int, default=5, help="lancements par mesure (médiane)")
+    parser.add_argument("--output", help="fichier JSON des résultats")
+    args = parser.parse_args()
+
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy",
+               GAMES_STARTUP_TIME="1", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    interpreter = median([run([sys.executable, "-c", "pass"], ROOT, env) for _ in range(args.runs)])
+    print(f"interpréteur seul : {interpreter * 1000:.1f} ms")
+
+    results = {"interpreter_ms": interpreter * 1000, "games": {}}
+    for name, folder, script, import_code in GAMES:
+        cwd = os.path.join(ROOT, folder)
+        import_time = median([run([sys.executable, "-c", import_code], cwd, env) for _ in range(args.runs)])
+        frame_time = median([run([sys.executable, script], cwd, env) for _ in range(args.runs)])
+        results["games"][name] = {
+            "import_ms": (import_time - interpreter) * 1000,
+            "first_frame_ms": (frame_time - interpreter) * 1000,
+        }
+        print(f"{name:14s} import {(import_time - interpreter) * 1000:8.1f} ms   "
+              f"première image {(frame_time - interpreter) * 1000:8.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# Ressources pygame partagées par les trois jeux : polices, textes déjà rendus, images et sons.
+# Chaque ressource est créée une seule fois puis réutilisée : une police n'est plus recherchée
+# parmi les polices du système à chaque image, et un texte n'est rendu à nouveau que s'il change.
+#
+# Les jeux ajoutent le dossier parent à sys.path pour importer ce module :
+#
+#     sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+#     import resources
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pygame
+
+import telemetry
+
+TEXT_CACHE_SIZE = 256   # Nombre de textes rendus gardés en mémoire
+
+# Mode de mesure du démarrage : avec la variable d'environnement GAMES_STARTUP_TIME=1, un jeu
+# affiche le temps mis pour sa première image puis s'arrête (voir benchmarks/startup.py)
+STARTUP_TIME = bool(os.environ.get("GAMES_STARTUP_TIME"))
+_import_time = time.perf_counter()
+
+_fonts = {}
+_texts = OrderedDict()
+_images = {}
+_sounds = {}
+
+
+def get_font(name=None, size=24):
+    # Police `name` du système (None : police par défaut de pygame) à la taille `size`
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = pygame.font.SysFont(name, size) if name else pygame.font.Font(None, size)
+        _fonts[key] = font
+    return font
+
+
+def render_text(text, size, color, name=None, antialias=True):
+    # Surface du texte, rendue seulement la première fois. Les textes les moins récemment
+    # utilisés sont oubliés au-delà de TEXT_CACHE_SIZE (un score qui change crée une entrée).
+    key = (text, size, color, name, antialias)
+    surface = _texts.get(key)
+    if surface is None:
+        telemetry.count("text_cache.misses")
+        surface = get_font(name, size).render(text, antialias, color)
+        _texts[key] = surface
+        if len(_texts) > TEXT_CACHE_SIZE:
+            _texts.popitem(last=False)
+    else:
+        telemetry.count("text_cache.hits")
+        _texts.move_to_end(key)
+    return surface
+
+
+def load_image(path, alpha=False):
+    # Image convertie au format de l'écran, pour que chaque blit évite la conversion des pixels.
+    # La conversion demande une fenêtre ouverte : sans fenêtre, l'image est gardée telle quelle.
+    key = (path, alpha)
+    image = _images.get(key)
+    if image is None:
+        image = pygame.image.load(path)
+        if pygame.display.get_surface() is not None:
+            image = image.convert_alpha() if alpha else image.convert()
+            _images[key] = image
+    return image
+
+
+def load_sound(path):
+    sound = _sounds.get(path)
+    if sound is None:
+        sound = pygame.mixer.Sound(path)
+        _sounds[path] = sound
+    return sound
+
+
+def load_sounds_async(paths, music=None):
+    # Initialise le son et charge les sons `paths` ({nom: chemin}) dans un thread, puis lance la
+    # musique en boucle : le jeu peut afficher ses premières images pendant ce temps.
+    # Retourne le dictionnaire des sons, rempli au fur et à mesure (voir play_sound).
+    sounds = {}
+
+    def load():
+        try:
+            pygame.mixer.init()
+        except pygame.error as e:
+            print(f"Impossible d'initialiser le son : {e}")
+            return
+        for name, path in paths.items():
+            sounds[name] = load_sound(path)
+        if music is not None:
+            try:
+                pygame.mixer.music.load(music)
+                # Jouer la musique en boucle
+                pygame.mixer.music.play(-1)
+            except pygame.error as e:
+                print(f"Impossible de charger la musique : {e}")
+
+    threading.Thread(target=load, daemon=True).start()
+    return sounds
+
+
+def play_sound(sounds, name):
+    # Joue le son `name` s'il est déjà chargé
+    sound = sounds.get(name)
+    if sound is not None:
+        sound.play()
+
+
+def first_frame_shown():
+    # À appeler après chaque image affichée : en mode de mesure du démarrage, la première
+    # arrête le jeu après avoir affiché le temps écoulé depuis le chargement de ce module
+    if STARTUP_TIME:
+        print(f"Première image après {(time.perf_counter() - _import_time) * 1000:.1f} ms")
+        pygame.quit()
+        sys.exit(0)
+
+
+def clear():
+    _fonts.clear()
+    _texts.clear()
+    _images.clear()
+    _sounds.clear()
@@ -0,0 +1,178 @@
+# Mesures de performance des boucles des jeux : durée de chaque phase d'une image
+# (événements, IA, rendu, affichage...), compteurs (nœuds de l'IA, expansions de l'A*,
+# succès des caches...), affichage à l'écran et export en JSON-lines.
+#
+# Désactivé par défaut : chaque fonction retourne alors immédiatement. Pour l'activer :
+#
+#     GAMES_TELEMETRY=1                        mesures actives
+#     GAMES_TELEMETRY_FILE=mesures.jsonl       une ligne JSON par seconde dans ce fichier
+#     GAMES_TELEMETRY_HUD=1                    affichage des mesures à l'écran (F3 en jeu)
+#     GAMES_TELEMETRY_SPIKE_MS=50              durée à partir de laquelle une image est un pic
+#
+# Dans une boucle, lap(phase) attribue à `phase` le temps écoulé depuis l'appel précédent,
+# et end_frame() termine l'image (le temps non attribué est compté dans "other").
+# La phase "idle" est l'attente de la prochaine image (clock.tick) : elle n'est pas comptée
+# dans le temps de travail de l'image.
+# Chaque ligne exportée résume la période écoulée : images par seconde, temps de travail des
+# images (moyenne, p50, p99, max), durée moyenne et maximale de chaque phase, compteurs, et le
+# détail par phase des images dont le temps de travail dépasse SPIKE_MS.
+
+import json
+import os
+import time
+
+ENABLED = bool(os.environ.get("GAMES_TELEMETRY"))
+EXPORT_FILE = os.environ.get("GAMES_TELEMETRY_FILE")
+HUD = bool(os.environ.get("GAMES_TELEMETRY_HUD"))
+SPIKE_MS = float(os.environ.get("GAMES_TELEMETRY_SPIKE_MS", 50))
+EXPORT_INTERVAL = 1.0   # Secondes entre deux résumés
+MAX_SPIKES = 10         # Pics détaillés par résumé
+
+if EXPORT_FILE or HUD:
+    ENABLED = True
+
+_game = None
+_frame_start = _last = _period_start = time.perf_counter()
+_phases = {}        # Durée de chaque phase dans l'image en cours
+_frames = []        # (temps de travail, phases) des images de la période
+_counters = {}
+_export = None      # Fichier ouvert de l'export
+_hud = None         # Surface pygame du dernier résumé
+last_summary = None
+
+
+def start(game):
+    # Début des mesures d'un jeu : `game` est le nom écrit dans chaque résumé
+    global _game, _frame_start, _last, _period_start
+    _game = game
+    _frame_start = _last = _period_start = time.perf_counter()
+    _phases.clear()
+    _frames.clear()
+    _counters.clear()
+
+
+def lap(phase):
+    global _last
+    if not ENABLED:
+        return
+    now = time.perf_counter()
+    _phases[phase] = _phases.get(phase, 0.0) + now - _last
+    _last = now
+
+
+def count(name, n=1):
+    if not ENABLED:
+        return
+    _counters[name] = _counters.get(name, 0) + n
+
+
+def end_frame():
+    global _phases, _frame_start, _last
+    if not ENABLED:
+        return
+    now = time.perf_counter()
+    if now > _last:
+        _phases["other"] = _phases.get("other", 0.0) + now - _last
+    _frames.append((now - _frame_start - _phases.get("idle", 0.0), _phases))
+    _phases = {}
+    _frame_start = _last = now
+    if now - _period_start >= EXPORT_INTERVAL:
+        _flush(now)
+        _frame_start = _last = time.perf_counter()     # Le résumé n'est pas compté dans l'image suivante
+
+
+def toggle_hud():
+    # Affiche ou cache les mesures à l'écran ; les mesures démarrent si elles étaient désactivées
+    global ENABLED, HUD, _hud
+    HUD = not HUD
+    _hud = None
+    if HUD and not ENABLED:
+        ENABLED = True
+        start(_game)
+
+
+def hud_surface():
+    # Surface du dernier résumé (None si l'affichage est désactivé ou pas encore prêt).
+    # Elle n'est refaite qu'une fois par résumé : le même objet est retourné entre-temps.
+    return _hud if HUD else None
+
+
+def draw_hud(surface, pos=(5, 5)):
+    # Dessine les mesures sur `surface`, retourne la zone touchée (None si rien n'est dessiné)
+    hud = hud_surface()
+    if hud is None:
+        return None
+    return surface.blit(hud, pos)
+
+
+#_______________Résumés______________________
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def _summary(now):
+    period = now - _period_start
+    durations = sorted(total for total, _ in _frames)
+    n = len(durations)
+    phases = {}
+    for _, frame_phases in _frames:
+        for phase, duration in frame_phases.items():
+            total, longest = phases.get(phase, (0.0, 0.0))
+            phases[phase] = (total + duration, max(longest, duration))
+    spikes = [{"busy_ms": _ms(total), "phases_ms": {phase: _ms(d) for phase, d in frame_phases.items()}}
+              for total, frame_phases in _frames if total * 1000 >= SPIKE_MS]
+    return {
+        "time": round(time.time(), 3),
+        "game": _game,
+        "frames": n,
+        "fps": round(n / period, 1) if period else 0.0,
+        "busy_ms": {
+            "mean": _ms(sum(durations) / n) if n else 0.0,
+            "p50": _ms(durations[n // 2]) if n else 0.0,
+            "p99": _ms(durations[min(n - 1, int(n * 0.99))]) if n else 0.0,
+            "max": _ms(durations[-1]) if n else 0.0,
+        },
+        "phases_ms": {phase: {"mean": _ms(total / n), "max": _ms(longest)}
+                      for phase, (total, longest) in sorted(phases.items())},
+        "counters": dict(sorted(_counters.items())),
+        "spikes": len(spikes),
+        "spike_frames": spikes[:MAX_SPIKES],
+    }
+
+
+def _flush(now):
+    global _period_start, _export, _hud, last_summary
+    last_summary = _summary(now)
+    if EXPORT_FILE:
+        if _export is None:
+            _export = open(EXPORT_FILE, "a")
+        _export.write(json.dumps(last_summary) + "\n")
+        _export.flush()
+    if HUD:
+        _hud = _render_hud(last_summary)
+    _frames.clear()
+    _counters.clear()
+    _period_start = now
+
+
+def _render_hud(summary):
+    import pygame   # Seulement quand l'affichage est demandé
+    import resources
+
+    frame = summary["busy_ms"]
+    lines = [f"{summary['fps']:.0f} fps  p99 {frame['p99']:.1f}  max {frame['max']:.1f} ms",
+             f"pics > {SPIKE_MS:.0f} ms : {summary['spikes']}"]
+    lines += [f"{phase} {d['mean']:.2f} ms (max {d['max']:.1f})" for phase, d in summary["phases_ms"].items()]
+    lines += [f"{name} {value}" for name, value in summary["counters"].items()]
+
+    font = resources.get_font(None, 16)
+    texts = [font.render(line, True, (255, 255, 255)) for line in lines]
+    hud = pygame.Surface((max(text.get_width() for text in texts) + 8,
+                          sum(text.get_height() for text in texts) + 8), pygame.SRCALPHA)
+    hud.fill((0, 0, 0, 170))
+    y = 4
+    for text in texts:
+        hud.blit(text, (4, y))
+        y += text.get_height()
+    return hud